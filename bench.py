@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+# Frame-time benchmark for each game state. Runs under SDL's dummy video and
+# audio drivers so it works on headless build machines; the drivers have to
+# be chosen before pygame is imported.
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+import rps
+import engine
+import strategies
+
+STATES = ["menu", "playing", "result", "victory", "defeat"]
+PHASES = ["update", "draw", "present", "frame"]
+PERCENTILES = [50, 95, 99]
+NOISE_FLOOR_MS = 0.05  # Differences below this are timer noise, not regressions
+
+
+class FixedStrategy(strategies.Strategy):
+    # Always plays the same move, so scripted matches end the way we want
+    name = "fixed"
+
+    def __init__(self, move, variant):
+        super().__init__(0, variant)
+        self.move = move
+
+    def choose(self):
+        return self.move
+
+
+def motion(pos):
+    return pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+
+
+def click(game, button):
+    game.handle_event(motion(button.rect.center))
+    game.handle_event(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=button.rect.center, button=1))
+
+
+def reveal(game):
+    # Skip the computer's thinking delay
+    game.computer_reveal_timer -= rps.REVEAL_DELAY_MS + 1
+    game.update(0)
+
+
+def play_round(game, move):
+    click(game, rps.widgets.choice_layout(game.variant).buttons[move])
+    reveal(game)
+
+
+def scripted_moves(variant, state):
+    # The (player, computer) moves that decide every round the way the state
+    # needs, or None if no move in the variant beats another
+    wanted = engine.COMPUTER_WIN if state == "defeat" else engine.PLAYER_WIN
+    moves = range(len(variant))
+    return next(((p, c) for p in moves for c in moves if variant.outcomes[p][c] == wanted), None)
+
+
+def setup(state, variant):
+    # Drive a fresh game into the state through the same clicks a player makes
+    player_move, computer_move = scripted_moves(variant, state) or (0, 0)
+    game = rps.Game(FixedStrategy(computer_move, variant), variant=variant)
+    if state == "menu":
+        return game
+
+    click(game, rps.widgets.play_button)
+    if state == "playing":
+        click(game, rps.widgets.choice_layout(variant).buttons[player_move])
+        return game
+
+    play_round(game, player_move)
+    if state in ("victory", "defeat"):
+        while game.state == rps.RESULT:
+            click(game, rps.widgets.play_again_button)
+            play_round(game, player_move)
+    return game
+
+
+def script_input(game, frame):
+    # Move the pointer on and off the state's first button every 15 frames
+    buttons = game.visible_buttons()
+    if buttons and frame % 15 == 0:
+        target = buttons[0].rect.center if frame % 30 == 0 else (5, 595)
+        game.handle_event(motion(target))
+
+
+def bench_state(state, frames, warmup, variant=engine.CLASSIC):
+    game = setup(state, variant)
+    assert game.state_name == state, game.state_name
+    samples = {phase: [] for phase in PHASES}
+    clock = time.perf_counter
+    for frame in range(warmup + frames):
+        script_input(game, frame)
+        if state == "playing":
+            # Keep the computer thinking for the whole run
+            game.computer_reveal_timer = game.time_ms
+
+        # Always a full repaint, this measures the worst case for each state
+        rps.dirty.mark_all()
+        start = clock()
+        game.update(1 / rps.FPS)
+        updated = clock()
+        rects = rps.dirty.flush()
+        game.draw()
+        drawn = clock()
+        pygame.display.update(rects)
+        presented = clock()
+
+        if frame >= warmup:
+            samples["update"].append(updated - start)
+            samples["draw"].append(drawn - updated)
+            samples["present"].append(presented - drawn)
+            samples["frame"].append(presented - start)
+
+    return {phase: summarize(values) for phase, values in samples.items()}
+
+
+def summarize(values):
+    ordered = sorted(values)
+    summary = {f"p{p}": ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000 for p in PERCENTILES}
+    summary["max"] = ordered[-1] * 1000
+    summary["mean"] = sum(ordered) / len(ordered) * 1000
+    return summary
+
+
+def check(results, thresholds, baseline):
+    # Absolute budgets from the thresholds file, plus relative regressions
+    # against an earlier results file when one is given
+    failures = []
+    budgets = thresholds.get("budgets_ms", {})
+    tolerance = thresholds.get("tolerance", 0.25)
+    for state, phases in results["states"].items():
+        for key, budget in budgets.get(state, budgets.get("default", {})).items():
+            phase, stat = key.rsplit("_", 1)
+            value = phases[phase][stat]
+            if value > budget:
+                failures.append(f"{state} {phase} {stat} {value:.3f} ms is over the {budget:.3f} ms budget")
+
+        if baseline and state in baseline["states"]:
+            for phase in PHASES:
+                before = baseline["states"][state][phase]["p95"]
+                after = phases[phase]["p95"]
+                if after > before * (1 + tolerance) and after - before > NOISE_FLOOR_MS:
+                    failures.append(f"{state} {phase} p95 went from {before:.3f} ms to {after:.3f} ms")
+    return failures
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Headless per-state frame-time benchmark")
+    parser.add_argument("states", nargs="*", default=STATES, help=f"any of: {', '.join(STATES)}")
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--thresholds", default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                             "bench_thresholds.json"))
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--variant", default="classic", help="rule variant name or definition file")
+    parser.add_argument("--moves", type=int, help="use generated cyclic rules with this many (odd) moves instead")
+    args = parser.parse_args(argv)
+    for state in args.states:
+        if state not in STATES:
+            parser.error(f"unknown state {state!r}, choose from: {', '.join(STATES)}")
+    try:
+        if args.moves:
+            names = [f"move {i + 1}" for i in range(args.moves)]
+            variant = engine.Variant(f"cyclic-{args.moves}", names, engine.cyclic_beats(names))
+        else:
+            variant = engine.load_variant(args.variant)
+    except ValueError as e:
+        parser.error(str(e))
+    if scripted_moves(variant, "result") is None:
+        unreachable = [state for state in args.states if state not in ("menu", "playing")]
+        if unreachable:
+            parser.error(f"no move beats another in {variant.name}, so {', '.join(unreachable)} cannot be reached")
+
+    results = {
+        "meta": {
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "video_driver": pygame.display.get_driver(),
+            "variant": variant.name,
+            "moves": len(variant),
+            "frames": args.frames,
+            "timestamp": int(time.time()),
+        },
+        "states": {},
+    }
+    for state in args.states:
+        results["states"][state] = bench_state(state, args.frames, args.warmup, variant)
+        phases = results["states"][state]
+        print(f"{state:<10}" + "  ".join(f"{phase} p50 {phases[phase]['p50']:.3f} p95 {phases[phase]['p95']:.3f}"
+                                         for phase in PHASES))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    thresholds = {}
+    if os.path.exists(args.thresholds):
+        with open(args.thresholds) as f:
+            thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failures = check(results, thresholds, baseline)
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,224 @@
+import os
+import sys
+import zlib
+import queue
+import shlex
+import struct
+import threading
+import subprocess
+
+# Frame capture for videos and bug clips. Each captured frame is copied out of
+# the surface's pixel buffer into one of a few preallocated slots, and a
+# background thread writes the slots out as a raw video file, a sequence of
+# raw or PNG files, or the stdin of an encoder process. When every slot is
+# still waiting to be written the frame is dropped, so capture never holds up
+# the game loop; tools that render faster than real time block instead.
+
+SLOTS = 8  # Frames that can wait for the writer
+PNG_COMPRESSION = 1  # zlib level, frames usually get encoded into a video afterwards
+
+
+class PixelLayout:
+    # Where each channel sits in the surface's pixel buffer
+    def __init__(self, surface):
+        self.size = surface.get_size()
+        self.pitch = surface.get_pitch()
+        self.bytesize = surface.get_bytesize()
+        if self.bytesize not in (3, 4):
+            raise ValueError(f"frames can only be captured from 24 or 32-bit surfaces, not {surface.get_bitsize()}-bit")
+        masks = surface.get_masks()
+        shifts = surface.get_shifts()
+        self.offsets = {}
+        for channel, mask, shift in zip("rgba", masks, shifts):
+            if mask:
+                byte = shift // 8
+                self.offsets[channel] = byte if sys.byteorder == "little" else self.bytesize - 1 - byte
+
+    @property
+    def row_bytes(self):
+        return self.size[0] * self.bytesize
+
+    @property
+    def pix_fmt(self):
+        # The layout's name in ffmpeg's terms, e.g. bgr0 or rgb24
+        names = ["0"] * self.bytesize
+        for channel, offset in self.offsets.items():
+            names[offset] = channel
+        return "".join(names) + ("24" if self.bytesize == 3 else "")
+
+    def rows(self, pixels):
+        # The frame without the padding some surfaces keep at the end of each row
+        if self.pitch == self.row_bytes:
+            return [pixels]
+        view = memoryview(pixels)
+        return [view[y * self.pitch:y * self.pitch + self.row_bytes] for y in range(self.size[1])]
+
+    def png(self, pixels):
+        # Whole-frame slicing reorders the channels in a few C-level copies,
+        # and zlib releases the GIL while it compresses
+        width, height = self.size
+        packed = pixels if self.pitch == self.row_bytes else b"".join(self.rows(pixels))
+        rgb = bytearray(width * height * 3)
+        for i, channel in enumerate("rgb"):
+            rgb[i::3] = packed[self.offsets[channel]::self.bytesize]
+        row = width * 3
+        scanlines = bytearray((row + 1) * height)  # Each row starts with filter type 0
+        view = memoryview(rgb)
+        for y in range(height):
+            scanlines[y * (row + 1) + 1:(y + 1) * (row + 1)] = view[y * row:(y + 1) * row]
+        return (b"\x89PNG\r\n\x1a\n" + png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+                + png_chunk(b"IDAT", zlib.compress(scanlines, PNG_COMPRESSION)) + png_chunk(b"IEND", b""))
+
+
+def png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+class RawStream:
+    # Every frame appended to one file, readable by any tool that takes raw video
+    def __init__(self, path, layout):
+        self.layout = layout
+        self.target = path
+        self.file = open(path, "wb")
+
+    def write(self, number, pixels):
+        self.file.writelines(self.layout.rows(pixels))
+
+    def close(self):
+        self.file.close()
+
+
+class FrameFiles:
+    # One file per frame, named by a printf-style pattern such as frames/%05d.png
+    def __init__(self, pattern, layout):
+        self.layout = layout
+        self.target = pattern
+        self.png = pattern.lower().endswith(".png")
+        try:
+            directory = os.path.dirname(pattern % 0)
+        except (TypeError, ValueError):
+            raise ValueError(f"{pattern!r} is not a frame number pattern like frames/%05d.png")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, number, pixels):
+        with open(self.target % number, "wb") as f:
+            if self.png:
+                f.write(self.layout.png(pixels))
+            else:
+                f.writelines(self.layout.rows(pixels))
+
+    def close(self):
+        pass
+
+
+class Encoder:
+    # Raw frames piped to the stdin of an encoder process such as ffmpeg
+    def __init__(self, command, layout, fps):
+        width, height = layout.size
+        self.layout = layout
+        self.target = command.format(width=width, height=height, fps=fps, pix_fmt=layout.pix_fmt)
+        self.process = subprocess.Popen(shlex.split(self.target), stdin=subprocess.PIPE)
+
+    def write(self, number, pixels):
+        self.process.stdin.writelines(self.layout.rows(pixels))
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass  # The encoder already went away, its exit status says why
+        status = self.process.wait()
+        if status:
+            raise OSError(f"encoder exited with status {status}")
+
+
+class Capture:
+    # Frames travel to the writer thread in slots and come back on the free
+    # queue once written, so no buffer is allocated after the first frame
+    def __init__(self, writer, block=False, slots=SLOTS):
+        self.layout = writer.layout
+        self.writer = writer
+        self.block = block
+        self.free = queue.Queue()
+        for _ in range(slots):
+            self.free.put(bytearray(self.layout.pitch * self.layout.size[1]))
+        self.pending = queue.Queue(slots)
+        self.captured = self.dropped = self.skipped = 0
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="frame-capture", daemon=True)
+        self.thread.start()
+
+    def frame(self, surface):
+        # Called once per presented frame
+        if self.error or self.closed:
+            return
+        if surface.get_size() != self.layout.size or surface.get_pitch() != self.layout.pitch:
+            # The window changed size, a video keeps the size it started with
+            self.skipped += 1
+            return
+        try:
+            slot = self.free.get(self.block)
+        except queue.Empty:
+            self.dropped += 1
+            return
+        with memoryview(surface.get_buffer()) as pixels:
+            slot[:] = pixels
+        self.pending.put((self.captured, slot))
+        self.captured += 1
+
+    def run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            number, slot = item
+            if self.error is None:
+                try:
+                    self.writer.write(number, slot)
+                except (OSError, ValueError) as e:
+                    self.error = e
+                    print(f"Capture stopped: {e}")
+            self.free.put(slot)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.pending.put(None)
+        self.thread.join()
+        try:
+            self.writer.close()
+        except OSError as e:
+            self.error = self.error or e
+        print(f"Captured {self.captured} frames to {self.writer.target} "
+              f"({self.dropped} dropped, {self.skipped} skipped after a resize)")
+        if self.error:
+            print(f"Capture failed, not every frame was written: {self.error}")
+
+
+def add_arguments(parser):
+    parser.add_argument("--capture", metavar="PATH",
+                        help="save the frames: a pattern such as frames/%%05d.png or frames/%%05d.raw "
+                             "writes one file per frame, anything else one raw video file")
+    parser.add_argument("--capture-cmd", metavar="COMMAND",
+                        help="pipe raw frames to an encoder command, {width} {height} {fps} and {pix_fmt} "
+                             "are filled in")
+
+
+def from_args(args, surface, fps, block=False):
+    # The capture the command line asked for, or None. Raises ValueError or
+    # OSError when it cannot be started.
+    if not (args.capture or args.capture_cmd):
+        return None
+    layout = PixelLayout(surface)
+    if args.capture_cmd:
+        writer = Encoder(args.capture_cmd, layout, fps)
+    elif "%" in args.capture:
+        writer = FrameFiles(args.capture, layout)
+    else:
+        writer = RawStream(args.capture, layout)
+        width, height = layout.size
+        print(f"Capturing raw {layout.pix_fmt} frames at {width}x{height}, {fps} FPS to {args.capture}")
+    return Capture(writer, block)
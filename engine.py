@@ -0,0 +1,307 @@
+import os
+import sys
+import json
+import time
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # Only the batched API needs NumPy
+    np = None
+
+# Rules, scoring and first-to-5 match flow with no display or audio
+# dependency, so matches can be simulated on headless machines.
+
+MOVES = ("rock", "paper", "scissors")
+ROCK, PAPER, SCISSORS = range(3)
+MOVE_INDEX = {move: i for i, move in enumerate(MOVES)}
+
+# Round outcomes, always from the player's point of view
+TIE = 0
+PLAYER_WIN = 1
+COMPUTER_WIN = 2
+
+WINS_NEEDED = 5
+
+# What each move beats
+BEATS = {ROCK: SCISSORS, PAPER: ROCK, SCISSORS: PAPER}
+
+# OUTCOME_TABLE[player][computer] -> outcome
+OUTCOME_TABLE = tuple(
+    tuple(TIE if p == c else PLAYER_WIN if BEATS[p] == c else COMPUTER_WIN
+          for c in range(len(MOVES)))
+    for p in range(len(MOVES))
+)
+
+SCORE_KEYS = {TIE: "draws", PLAYER_WIN: "player", COMPUTER_WIN: "computer"}
+
+MatchResults = namedtuple("MatchResults", "winner rounds player computer draws")
+
+VARIANT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "variants")
+
+
+class Variant:
+    # A rule set: the moves in order and the moves each one beats. Outcomes of
+    # every pairing are precomputed into an N x N table, so resolving a round
+    # costs two lookups however many moves there are. Pairs where neither
+    # move beats the other are ties.
+    def __init__(self, name, moves, beats, images=None, title=None):
+        self.name = name
+        self.title = title or name
+        self.moves = tuple(moves)
+        if len(self.moves) < 2:
+            raise ValueError(f"{name}: a variant needs at least two moves")
+        self.index = {move: i for i, move in enumerate(self.moves)}
+        if len(self.index) != len(self.moves):
+            raise ValueError(f"{name}: move names must be unique")
+        self.images = tuple(images) if images else (None,) * len(self.moves)
+
+        n = len(self.moves)
+        wins = [bytearray(n) for _ in range(n)]
+        for move, beaten in beats.items():
+            for other in beaten:
+                if move not in self.index or other not in self.index:
+                    raise ValueError(f"{name}: unknown move in {move!r} beats {other!r}")
+                a, b = self.index[move], self.index[other]
+                if a == b:
+                    raise ValueError(f"{name}: {move!r} cannot beat itself")
+                wins[a][b] = 1
+        for a in range(n):
+            for b in range(a):
+                if wins[a][b] and wins[b][a]:
+                    raise ValueError(f"{name}: {self.moves[a]!r} and {self.moves[b]!r} beat each other")
+
+        # outcomes[player][computer] -> outcome, one bytes row per player move
+        self.outcomes = tuple(
+            bytes(TIE if a == b else PLAYER_WIN if wins[a][b] else COMPUTER_WIN if wins[b][a] else TIE
+                  for b in range(n))
+            for a in range(n)
+        )
+        # counter[move] is the first move that beats it (the move itself if none does)
+        self.counter = tuple(next((c for c in range(n) if wins[c][m]), m) for m in range(n))
+
+    def __len__(self):
+        return len(self.moves)
+
+    def resolve(self, player_move, computer_move):
+        return self.outcomes[player_move][computer_move]
+
+    def beaten(self, move):
+        # Indices of the moves this move beats
+        return [other for other, outcome in enumerate(self.outcomes[move]) if outcome == PLAYER_WIN]
+
+    def definition(self):
+        # The rules in the form of a definition file, parse_variant rebuilds them
+        moves = []
+        for move, name in enumerate(self.moves):
+            entry = {"name": name, "beats": [self.moves[other] for other in self.beaten(move)]}
+            if self.images[move]:
+                entry["image"] = self.images[move]
+            moves.append(entry)
+        return {"title": self.title, "moves": moves}
+
+
+def cyclic_beats(moves):
+    # Balanced rules for an odd number of moves: each beats the (N - 1) / 2
+    # moves after it in the list, wrapping around, and loses to the rest
+    n = len(moves)
+    if n % 2 == 0:
+        raise ValueError("cyclic rules need an odd number of moves")
+    return {move: [moves[(i + k) % n] for k in range(1, n // 2 + 1)] for i, move in enumerate(moves)}
+
+
+def load_variant(name):
+    # A variant is "classic", a file in variants/ named without its .json
+    # extension, or a path to a definition file
+    if name in (None, "classic"):
+        return CLASSIC
+    path = name if os.path.exists(name) else os.path.join(VARIANT_DIR, f"{name}.json")
+    try:
+        with open(path) as f:
+            definition = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"Unknown variant {name!r}, choose from: {', '.join(variant_names())}") from None
+    return parse_variant(name, definition)
+
+
+def parse_variant(name, definition):
+    # Builds a Variant from a parsed definition file. Moves are objects with a
+    # name, an optional image and the names they beat; with "rule": "cyclic"
+    # they may be plain names and the beats are generated. Raises ValueError
+    # for anything malformed.
+    if not isinstance(definition, dict) or not isinstance(definition.get("moves"), list):
+        raise ValueError(f"{name}: a definition is an object with a list of moves")
+    if not isinstance(definition.get("title", ""), str):
+        raise ValueError(f"{name}: the title must be a string")
+    moves = definition["moves"]
+    cyclic = definition.get("rule") == "cyclic"
+    for move in moves:
+        if isinstance(move, dict):
+            beats = move.get("beats", [])
+            if (not isinstance(move.get("name"), str) or not isinstance(beats, list)
+                    or not all(isinstance(other, str) for other in beats)
+                    or not isinstance(move.get("image", ""), str)):
+                raise ValueError(f"{name}: each move needs a name and a list of the moves it beats, got {move!r}")
+        elif not (cyclic and isinstance(move, str)):
+            raise ValueError(f"{name}: moves are objects, plain names need \"rule\": \"cyclic\", got {move!r}")
+    names = [move["name"] if isinstance(move, dict) else move for move in moves]
+    if cyclic:
+        beats = cyclic_beats(names)
+    else:
+        beats = {move["name"]: move.get("beats", []) for move in moves}
+    images = [move.get("image") if isinstance(move, dict) else None for move in moves]
+    # Without a title the file name stands in, not the path it was loaded from
+    title = definition.get("title") or os.path.splitext(os.path.basename(name))[0]
+    return Variant(name, names, beats, images, title)
+
+
+def variant_names():
+    if not os.path.isdir(VARIANT_DIR):
+        return ["classic"]
+    return ["classic"] + sorted(f[:-5] for f in os.listdir(VARIANT_DIR) if f.endswith(".json"))
+
+
+CLASSIC = Variant("classic", MOVES, {MOVES[m]: [MOVES[BEATS[m]]] for m in range(len(MOVES))},
+                  [f"{move}.png" for move in MOVES], "Rock Paper Scissors")
+
+
+def move_index(move):
+    if isinstance(move, str):
+        return MOVE_INDEX[move]
+    return move
+
+
+def resolve(player_move, computer_move):
+    # Accepts move names or indices
+    return OUTCOME_TABLE[move_index(player_move)][move_index(computer_move)]
+
+
+class Match:
+    # Slotted counters rather than a dict, servers keep one of these per game.
+    # Moves may be names only for the classic rules.
+    __slots__ = ("wins_needed", "variant", "player", "computer", "draws")
+
+    def __init__(self, wins_needed=WINS_NEEDED, variant=CLASSIC):
+        self.wins_needed = wins_needed
+        self.variant = variant
+        self.reset()
+
+    def reset(self):
+        self.player = self.computer = self.draws = 0
+
+    @property
+    def scores(self):
+        return {"player": self.player, "computer": self.computer, "draws": self.draws}
+
+    def play_round(self, player_move, computer_move):
+        if self.variant is CLASSIC:
+            outcome = resolve(player_move, computer_move)
+        else:
+            outcome = self.variant.outcomes[player_move][computer_move]
+        if outcome == PLAYER_WIN:
+            self.player += 1
+        elif outcome == COMPUTER_WIN:
+            self.computer += 1
+        else:
+            self.draws += 1
+        return outcome
+
+    @property
+    def winner(self):
+        if self.player >= self.wins_needed:
+            return "player"
+        if self.computer >= self.wins_needed:
+            return "computer"
+        return None
+
+    @property
+    def finished(self):
+        return self.player >= self.wins_needed or self.computer >= self.wins_needed
+
+
+# Batched API
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("NumPy is required for batched simulation (pip install numpy)")
+
+
+def _outcome_array(variant=CLASSIC):
+    n = len(variant)
+    return np.frombuffer(b"".join(variant.outcomes), dtype=np.int8).reshape(n, n)
+
+
+def resolve_rounds(player_moves, computer_moves, variant=CLASSIC):
+    # Outcome of every round in two equally shaped arrays of move indices
+    _require_numpy()
+    return _outcome_array(variant)[np.asarray(player_moves), np.asarray(computer_moves)]
+
+
+def random_moves(shape, rng=None, variant=CLASSIC):
+    _require_numpy()
+    rng = rng if rng is not None else np.random.default_rng()
+    return rng.integers(0, len(variant), size=shape, dtype=np.int16 if len(variant) > 127 else np.int8)
+
+
+def play_matches(player_moves, computer_moves, wins_needed=WINS_NEEDED, chunk_size=65536, variant=CLASSIC):
+    # Plays one match per row of two (matches, rounds) move arrays. Rounds after
+    # a match is decided are ignored; winner is TIE for rows that ran out of
+    # rounds before anyone reached wins_needed.
+    _require_numpy()
+    player_moves = np.atleast_2d(np.asarray(player_moves))
+    computer_moves = np.atleast_2d(np.asarray(computer_moves))
+    table = _outcome_array(variant)
+    n_matches, n_rounds = player_moves.shape
+    count_type = np.int16 if n_rounds < np.iinfo(np.int16).max else np.int32
+
+    winner = np.empty(n_matches, dtype=np.int8)
+    rounds = np.empty(n_matches, dtype=np.int32)
+    player = np.empty(n_matches, dtype=np.int32)
+    computer = np.empty(n_matches, dtype=np.int32)
+
+    # Chunk the rows so the cumulative score arrays stay small
+    for start in range(0, n_matches, chunk_size):
+        stop = min(start + chunk_size, n_matches)
+        outcomes = table[player_moves[start:stop], computer_moves[start:stop]]
+        player_wins = np.cumsum(outcomes == PLAYER_WIN, axis=1, dtype=count_type)
+        computer_wins = np.cumsum(outcomes == COMPUTER_WIN, axis=1, dtype=count_type)
+        decided = (player_wins >= wins_needed) | (computer_wins >= wins_needed)
+        done = decided.any(axis=1)
+        end = np.where(done, decided.argmax(axis=1), n_rounds - 1)
+        rows = np.arange(stop - start)
+        p = player_wins[rows, end]
+        c = computer_wins[rows, end]
+
+        winner[start:stop] = np.where(p >= wins_needed, PLAYER_WIN,
+                                      np.where(c >= wins_needed, COMPUTER_WIN, TIE))
+        rounds[start:stop] = end + 1
+        player[start:stop] = p
+        computer[start:stop] = c
+
+    return MatchResults(winner, rounds, player, computer, rounds - player - computer)
+
+
+def simulate(n_matches, max_rounds=40, seed=None):
+    # Random player against random computer, mostly useful as a throughput check
+    _require_numpy()
+    rng = np.random.default_rng(seed)
+    return play_matches(random_moves((n_matches, max_rounds), rng),
+                        random_moves((n_matches, max_rounds), rng))
+
+
+def main(argv):
+    n_matches = int(argv[0]) if argv else 1000000
+    start = time.perf_counter()
+    results = simulate(n_matches, seed=0)
+    elapsed = time.perf_counter() - start
+
+    total_rounds = int(results.rounds.sum())
+    print(f"Simulated {n_matches} matches ({total_rounds} rounds) in {elapsed:.2f}s "
+          f"- {total_rounds / elapsed:,.0f} rounds/s")
+    print(f"Player won {np.mean(results.winner == PLAYER_WIN):.2%}, "
+          f"computer won {np.mean(results.winner == COMPUTER_WIN):.2%}, "
+          f"unfinished {np.mean(results.winner == TIE):.4%}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
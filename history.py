@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # Only the reader needs NumPy
+    np = None
+
+import engine
+
+# Append-only log of every round played. Each round is one fixed-width
+# little-endian record after a short file header, so the file can be
+# memory-mapped as a NumPy structured array and scanned without creating
+# Python objects per round.
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".local", "share", "beat-the-hand", "history.rps")
+
+MAGIC = b"RPSHIST1"
+HEADER_SIZE = len(MAGIC)
+
+# timestamp (ms since epoch), player move, computer move, outcome, padding, match id
+RECORD = struct.Struct("<qBBBxI")
+
+
+def record_dtype():
+    return np.dtype([("timestamp", "<i8"), ("player", "u1"), ("computer", "u1"),
+                     ("outcome", "u1"), ("pad", "u1"), ("match", "<u4")])
+
+
+class HistoryLog:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "ab+")
+
+        size = self.file.seek(0, os.SEEK_END)
+        if size == 0:
+            self.file.write(MAGIC)
+            self.file.flush()
+            size = HEADER_SIZE
+        else:
+            self.file.seek(0)
+            if self.file.read(HEADER_SIZE) != MAGIC:
+                self.file.close()
+                raise ValueError(f"{path} is not a match history file")
+
+        # A crash mid-write can leave a partial record, drop it so records stay aligned
+        whole = HEADER_SIZE + (size - HEADER_SIZE) // RECORD.size * RECORD.size
+        if whole != size:
+            self.file.truncate(whole)
+
+        self.last_match = 0
+        if whole > HEADER_SIZE:
+            self.file.seek(whole - RECORD.size)
+            self.last_match = RECORD.unpack(self.file.read(RECORD.size))[-1]
+        self.file.seek(0, os.SEEK_END)
+        self.match_open = False
+
+    def new_match(self):
+        # The id is allocated when the first round of the match is recorded
+        self.match_open = False
+
+    def append(self, player_move, computer_move, outcome, timestamp=None):
+        if not self.match_open:
+            self.last_match += 1
+            self.match_open = True
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+        self.file.write(RECORD.pack(timestamp, engine.move_index(player_move),
+                                    engine.move_index(computer_move), outcome, self.last_match))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def longest_run(mask):
+    # Length of the longest run of True values
+    if not len(mask):
+        return 0
+    edges = np.diff(np.concatenate(([0], mask.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return int((ends - starts).max()) if len(starts) else 0
+
+
+def current_run(mask):
+    # Length of the run of True values at the end
+    if not len(mask) or not mask[-1]:
+        return 0
+    misses = np.flatnonzero(~mask)
+    return len(mask) - (int(misses[-1]) + 1 if len(misses) else 0)
+
+
+class HistoryReader:
+    def __init__(self, path=DEFAULT_PATH):
+        if np is None:
+            raise RuntimeError("NumPy is required to read match history (pip install numpy)")
+        with open(path, "rb") as f:
+            if f.read(HEADER_SIZE) != MAGIC:
+                raise ValueError(f"{path} is not a match history file")
+        count = (os.path.getsize(path) - HEADER_SIZE) // RECORD.size
+        if count:
+            self.records = np.memmap(path, dtype=record_dtype(), mode="r",
+                                     offset=HEADER_SIZE, shape=(count,))
+        else:
+            self.records = np.empty(0, dtype=record_dtype())
+
+    def __len__(self):
+        return len(self.records)
+
+    def stats(self, wins_needed=engine.WINS_NEEDED):
+        records = self.records
+        outcome = records["outcome"]
+        player_won = outcome == engine.PLAYER_WIN
+        computer_won = outcome == engine.COMPUTER_WIN
+
+        # Per match scores, indexed by match id
+        match = records["match"]
+        match_player = np.bincount(match, weights=player_won)
+        match_computer = np.bincount(match, weights=computer_won)
+        played = np.bincount(match) > 0
+
+        per_move = {}
+        counts = np.bincount(records["player"], minlength=len(engine.MOVES))
+        wins = np.bincount(records["player"], weights=player_won, minlength=len(engine.MOVES))
+        for i, move in enumerate(engine.MOVES):
+            per_move[move] = {"rounds": int(counts[i]),
+                              "win_rate": float(wins[i] / counts[i]) if counts[i] else 0.0}
+
+        rounds = len(records)
+        return {
+            "rounds": rounds,
+            "matches": int(played.sum()),
+            "matches_won": int((match_player >= wins_needed).sum()),
+            "matches_lost": int((match_computer >= wins_needed).sum()),
+            "player_wins": int(player_won.sum()),
+            "computer_wins": int(computer_won.sum()),
+            "draws": int((outcome == engine.TIE).sum()),
+            "win_rate": float(player_won.mean()) if rounds else 0.0,
+            "longest_win_streak": longest_run(player_won),
+            "longest_loss_streak": longest_run(computer_won),
+            "current_win_streak": current_run(player_won),
+            "per_move": per_move,
+            "first_played": int(records["timestamp"][0]) if rounds else None,
+            "last_played": int(records["timestamp"][-1]) if rounds else None,
+        }
+
+
+def main(argv):
+    path = argv[0] if argv else DEFAULT_PATH
+    start = time.perf_counter()
+    stats = HistoryReader(path).stats()
+    elapsed = time.perf_counter() - start
+
+    per_move = stats.pop("per_move")
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    for move, move_stats in per_move.items():
+        print(f"{move}: {move_stats['rounds']} rounds, {move_stats['win_rate']:.1%} won")
+    print(f"Computed in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,102 @@
+import json
+import functools
+from time import perf_counter_ns
+from collections import deque
+
+# Per-frame timing of the main loop. Work is recorded as named spans inside
+# begin_frame()/end_frame(); outside a frame the hooks cost one attribute
+# check, so instrumented code can be called freely from tools and tests.
+
+
+class Section:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        self.profiler.depth += 1
+
+    def __exit__(self, *exc):
+        profiler = self.profiler
+        profiler.depth -= 1
+        if profiler.spans is not None:
+            profiler.spans.append((self.name, self.start, perf_counter_ns() - self.start, profiler.depth))
+
+
+class Profiler:
+    def __init__(self, frames=600):
+        self.frames = deque(maxlen=frames)  # (start ns, duration ns, spans) for recent frames
+        self.spans = None
+        self.depth = 0
+        self.frame_start = 0
+
+    def begin_frame(self):
+        self.spans = []
+        self.depth = 0
+        self.frame_start = perf_counter_ns()
+
+    def end_frame(self):
+        if self.spans is None:
+            return
+        self.frames.append((self.frame_start, perf_counter_ns() - self.frame_start, self.spans))
+        self.spans = None
+
+    def section(self, name):
+        return Section(self, name)
+
+    def profiled(self, name=None):
+        # Decorator that records every call of the function as a span
+        def wrap(func):
+            label = name or func.__name__
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if self.spans is None:
+                    return func(*args, **kwargs)
+                start = perf_counter_ns()
+                self.depth += 1
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.depth -= 1
+                    if self.spans is not None:
+                        self.spans.append((label, start, perf_counter_ns() - start, self.depth))
+            return wrapper
+        return wrap
+
+    def frame_times(self, count=None):
+        # Milliseconds of work in each recent frame, oldest first
+        frames = list(self.frames)[-count:] if count else self.frames
+        return [duration / 1e6 for start, duration, spans in frames]
+
+    def phase_times(self, count=60):
+        # Average milliseconds per frame spent in each named span. Nested spans
+        # are also part of their parent's time.
+        frames = list(self.frames)[-count:]
+        totals = {}
+        for start, duration, spans in frames:
+            for name, span_start, span_duration, depth in spans:
+                totals[name] = totals.get(name, 0) + span_duration
+        return {name: total / len(frames) / 1e6 for name, total in totals.items()} if frames else {}
+
+    def chrome_trace(self):
+        # Complete ("X") events in microseconds, loadable in chrome://tracing or Perfetto
+        if not self.frames:
+            return {"traceEvents": []}
+        origin = self.frames[0][0]
+        events = []
+        for number, (start, duration, spans) in enumerate(self.frames):
+            events.append({"name": "frame", "ph": "X", "pid": 0, "tid": 0, "ts": (start - origin) / 1000,
+                           "dur": duration / 1000, "args": {"frame": number}})
+            for name, span_start, span_duration, depth in spans:
+                events.append({"name": name, "ph": "X", "pid": 0, "tid": 0,
+                               "ts": (span_start - origin) / 1000, "dur": span_duration / 1000})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
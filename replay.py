@@ -0,0 +1,245 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import pygame
+
+import engine
+import capture
+import strategies
+
+# Record and replay of game sessions. A recording holds the rule variant and,
+# unless it is the classic one, its full rules, the strategy name and seed,
+# the window size, the pointer input the game received and window resizes
+# with their game-clock timestamps, and a "tick" entry for every frame in
+# which the computer's move was revealed, the only time-driven logic. Clicks
+# are in window pixels, so the layout is resized along with them. Replaying
+# the entries into a fresh game with the same seeded strategy reproduces the
+# session; verify does this without drawing or waiting on the frame clock, so
+# it runs as fast as the rules allow.
+
+VERSION = 1
+SETTLE_MS = 1000  # Longest play keeps rendering after the last entry, a hovered hand bounces forever
+
+
+class Recorder:
+    def __init__(self, strategy, seed, variant=engine.CLASSIC, size=None):
+        self.strategy = strategy
+        self.seed = seed
+        self.variant = variant
+        self.size = size  # Window size at the start, None for the default
+        # [ms, "motion", x, y] | [ms, "click", x, y, button] | [ms, "resize", width, height] | [ms, "tick"]
+        self.events = []
+        self.rounds = []  # [player move, computer move, outcome, player score, computer score, draws]
+
+    def event(self, time_ms, event):
+        if event.type == pygame.MOUSEMOTION:
+            self.events.append([time_ms, "motion", *event.pos])
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            self.events.append([time_ms, "click", *event.pos, event.button])
+
+    def resize(self, time_ms, size):
+        self.events.append([time_ms, "resize", *size])
+
+    def tick(self, time_ms):
+        self.events.append([time_ms, "tick"])
+
+    def round(self, player_move, computer_move, outcome, scores):
+        moves = self.variant.moves
+        self.rounds.append([moves[player_move], moves[computer_move], outcome,
+                            scores["player"], scores["computer"], scores["draws"]])
+
+    def session(self, game):
+        session = {
+            "version": VERSION,
+            "variant": self.variant.name,
+            "strategy": self.strategy,
+            "seed": self.seed,
+            "events": self.events,
+            "rounds": self.rounds,
+            "final": {"state": game.state_name, "scores": game.scores},
+        }
+        if self.size:
+            session["size"] = list(self.size)
+        if self.variant is not engine.CLASSIC:
+            # The rules themselves, the file they came from may move or change
+            session["rules"] = self.variant.definition()
+        return session
+
+    def save(self, path, game):
+        with open(path, "w") as f:
+            json.dump(self.session(game), f, separators=(",", ":"))
+
+
+def load(path):
+    with open(path) as f:
+        session = json.load(f)
+    if session.get("version") != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} recording")
+    return session
+
+
+class Replayer:
+    # Feeds a recording into a fresh game. Input entries go to handle_event,
+    # the reveal is checked at the end of every recorded frame exactly as the
+    # game loop does, so the game sees the same sequence it saw when recorded.
+    def __init__(self, rps, session):
+        self.rps = rps
+        self.session = session
+        name = session.get("variant", "classic")
+        variant = engine.parse_variant(name, session["rules"]) if "rules" in session else engine.load_variant(name)
+        size = session.get("size")
+        self.recorder = Recorder(session["strategy"], session["seed"], variant, size)
+        self.set_size(size or (rps.WINDOW_WIDTH, rps.WINDOW_HEIGHT))
+        strategy = strategies.create(session["strategy"], session["seed"], variant)
+        self.game = rps.Game(strategy, recorder=self.recorder, variant=variant)
+        self.entries = session["events"]
+        self.next_entry = 0
+
+    def set_size(self, size):
+        pygame.display.set_mode(size, pygame.RESIZABLE)
+        self.rps.resize()
+
+    @property
+    def stopped(self):
+        # The recorded player clicked Quit, nothing after that frame was played
+        return self.game.quit_requested and self.entries[self.next_entry][0] != self.game.time_ms
+
+    @property
+    def done(self):
+        return self.next_entry >= len(self.entries) or self.stopped
+
+    def advance(self, until=float("inf")):
+        # Applies every entry due by the game-clock time until
+        game = self.game
+        entries = self.entries
+        while not self.done and entries[self.next_entry][0] <= until:
+            entry = entries[self.next_entry]
+            if entry[0] != game.time_ms:
+                # A new frame, finish the previous one first
+                game.check_reveal()
+                game.time_ms = entry[0]
+            kind = entry[1]
+            if kind == "motion":
+                game.handle_event(pygame.event.Event(pygame.MOUSEMOTION, pos=(entry[2], entry[3]),
+                                                     rel=(0, 0), buttons=(0, 0, 0)))
+            elif kind == "click":
+                game.handle_event(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(entry[2], entry[3]),
+                                                     button=entry[4]))
+            elif kind == "resize":
+                self.set_size((entry[2], entry[3]))
+                self.recorder.resize(entry[0], (entry[2], entry[3]))
+            elif kind == "tick":
+                game.check_reveal()
+            self.next_entry += 1
+        if self.done:
+            game.check_reveal()
+
+    def mismatch(self):
+        # None when the replay reproduced the recording, otherwise a description
+        expected, actual = self.session["rounds"], self.recorder.rounds
+        for number, (want, got) in enumerate(zip(expected, actual), 1):
+            if want != got:
+                return f"round {number} was {want}, replayed as {got}"
+        if len(expected) != len(actual):
+            return f"{len(expected)} rounds recorded, {len(actual)} replayed"
+        final = self.recorder.session(self.game)["final"]
+        if final != self.session["final"]:
+            return f"ended as {self.session['final']}, replayed as {final}"
+        return None
+
+
+def verify(rps, paths, quiet=False):
+    start = time.perf_counter()
+    failures = rounds = 0
+    for path in paths:
+        try:
+            replayer = Replayer(rps, load(path))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ERROR {path}: {e}")
+            failures += 1
+            continue
+        replayer.advance()
+        problem = replayer.mismatch()
+        rounds += len(replayer.recorder.rounds)
+        if problem:
+            print(f"MISMATCH {path}: {problem}")
+            failures += 1
+        elif not quiet:
+            print(f"OK {path}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths)} sessions, {rounds:,} rounds, {failures} failed in {elapsed:.2f} s "
+          f"({len(paths) / elapsed if elapsed else 0:,.0f} sessions/s)")
+    return 1 if failures else 0
+
+
+def play(rps, replayer, path, speed, frame_capture=None):
+    # Shows the session on screen. Game time moves one frame per loop pass,
+    # scaled by speed, and a speed of 0 renders every frame without waiting.
+    # A capture gets every rendered frame.
+    game = replayer.game
+    frame_ms = 1000 / rps.FPS
+    now = replayer.entries[0][0] - frame_ms if replayer.entries else 0
+    end = replayer.entries[-1][0] + SETTLE_MS if replayer.entries else 0
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return 0
+        now += frame_ms * (speed or 1)
+        replayer.advance(now)
+        game.animate(1 / rps.FPS)
+        rps.dirty.flush()
+        game.draw()
+        pygame.display.flip()
+        if frame_capture:
+            frame_capture.frame(rps.screen)
+        if replayer.done and (game.idle_delay() is None or now >= end):
+            problem = replayer.mismatch()
+            print(f"MISMATCH {path}: {problem}" if problem else f"OK {path}")
+            return 1 if problem else 0
+        if speed:
+            rps.clock.tick(rps.FPS)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Replay recorded Beat the Hand sessions")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    verify_parser = commands.add_parser("verify", help="re-run recordings headless and compare the results")
+    verify_parser.add_argument("paths", nargs="+")
+    verify_parser.add_argument("--quiet", action="store_true", help="only report failures")
+
+    play_parser = commands.add_parser("play", help="show a recording on screen")
+    play_parser.add_argument("path")
+    play_parser.add_argument("--speed", type=float, default=1.0, help="playback speed, 0 for as fast as possible")
+    play_parser.add_argument("--headless", action="store_true", help="render without a window, e.g. to capture")
+    capture.add_arguments(play_parser)
+
+    args = parser.parse_args(argv)
+    if args.command == "verify" or args.headless:
+        # No window or sound needed, the drivers have to be chosen before rps starts pygame
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    import rps
+
+    if args.command == "verify":
+        return verify(rps, args.paths, args.quiet)
+
+    # Sizes the window as recorded, so the capture starts at that size
+    replayer = Replayer(rps, load(args.path))
+    try:
+        # Rendering here can outpace the writer, so wait for it instead of dropping frames
+        frame_capture = capture.from_args(args, rps.screen, rps.FPS, block=True)
+    except (OSError, ValueError) as e:
+        play_parser.error(f"cannot capture: {e}")
+    try:
+        return play(rps, replayer, args.path, args.speed, frame_capture)
+    finally:
+        if frame_capture:
+            frame_capture.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
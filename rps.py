@@ -1,24 +1,62 @@
 import pygame
+import os
+import io
 import sys
-import random
+import time
+import atexit
+import struct
+import hashlib
+import argparse
+import queue
+import threading
+from collections import OrderedDict
+from functools import partial
 from pygame import mixer
 
+import engine
+import history
+import capture
+import strategies
+from profiler import Profiler
+from replay import Recorder
+
+# Audio mixer settings, these have to be set before pygame.init() opens the mixer
+AUDIO_FREQUENCY = 44100
+AUDIO_BUFFER = 512
+mixer.pre_init(frequency=AUDIO_FREQUENCY, size=-16, channels=2, buffer=AUDIO_BUFFER)
+
+# Draw at the display's real resolution on high-DPI Windows screens instead
+# of letting the system stretch a low-resolution window
+os.environ.setdefault("SDL_WINDOWS_DPI_AWARENESS", "permonitorv2")
+
 # Initialize Pygame
 pygame.init()
 
 # Initialize audio mixer with proper settings
 try:
-    mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
+    if not mixer.get_init():
+        mixer.init()
     audio_enabled = True
     print("Audio initialized successfully")
 except pygame.error as e:
     audio_enabled = False
     print(f"Audio initialization failed: {e}. Continuing without sound.")
 
-# Constants
+# Constants. The layout is written for an 800x600 window and scaled to the
+# actual window size by View.
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
 FPS = 60
+IDLE_FPS = 4  # Wake-up rate while nothing on screen is moving
+MAX_FRAME_TIME = 0.1  # Longest step (seconds) an animation advances in one frame
+DIRTY_RENDERING = True  # Only redraw and present regions that changed
+
+# Animation speeds, per second
+BOUNCE_VELOCITY = -300
+BOUNCE_GRAVITY = 1080
+CHOICE_RISE_SPEED = 120
+POPUP_FADE_SPEED = 300
+REVEAL_DELAY_MS = 1000
 
 # Colors
 WHITE = (255, 255, 255)
@@ -32,130 +70,896 @@ PURPLE = (138, 43, 226)
 ORANGE = (255, 165, 0)
 
 # Game window setup
-screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.RESIZABLE)
 pygame.display.set_caption("Beat the Hand: Rock Paper Scissors")
 clock = pygame.time.Clock()
 
-# Game states
-MENU = "menu"
-PLAYING = "playing"
-RESULT = "result"
-VICTORY = "victory"
-DEFEAT = "defeat"
+class View:
+    # Maps layout coordinates, written for WINDOW_WIDTH x WINDOW_HEIGHT, onto
+    # the window: scaled uniformly to fit and centered. The background still
+    # fills the whole window.
+    def __init__(self, size):
+        self.resize(size)
+    
+    def resize(self, size):
+        self.size = tuple(size)
+        self.scale = min(size[0] / WINDOW_WIDTH, size[1] / WINDOW_HEIGHT)
+        self.left = (size[0] - round(WINDOW_WIDTH * self.scale)) // 2
+        self.top = (size[1] - round(WINDOW_HEIGHT * self.scale)) // 2
+    
+    def length(self, n):
+        return max(1, round(n * self.scale))
+    
+    def font(self, size):
+        return max(8, round(size * self.scale))
+    
+    def point(self, x, y):
+        return (self.left + int(x * self.scale), self.top + int(y * self.scale))
+    
+    def rect(self, x, y=None, width=None, height=None):
+        # Accepts a Rect or its four values
+        if y is None:
+            x, y, width, height = x
+        return pygame.Rect(self.point(x, y), (self.length(width), self.length(height)))
+    
+    def extent(self, size):
+        return (self.length(size[0]), self.length(size[1]))
+    
+    def centered(self, surface, y, x=WINDOW_WIDTH // 2):
+        # Screen position that centers the surface on layout column x, top at layout row y
+        left, top = self.point(x, y)
+        return (left - surface.get_width() // 2, top)
+
+view = View(screen.get_size())
 
-# Load images and sounds
-try:
-    bg_img = pygame.image.load("assets/background.png").convert_alpha()
-    bg_img = pygame.transform.scale(bg_img, (WINDOW_WIDTH, WINDOW_HEIGHT))
+# Game states, small ints so a game's state packs into a few bytes
+MENU, PLAYING, RESULT, VICTORY, DEFEAT = range(5)
+STATE_NAMES = ("menu", "playing", "result", "victory", "defeat")
+
+# Posted by the asset thread when images it was asked for are ready
+ASSETS_READY = pygame.event.custom_type()
+
+# Asset locations
+ASSET_DIR = "assets"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "beat-the-hand")
+HAND_SIZE = (120, 120)
+SCALED_SIZES = 4  # Window-dependent sizes kept in memory per image
+
+# Sound name -> (file, volume from 0.0 to 1.0, category)
+SOUNDS = {
+    "click": ("click.wav", 0.5, "ui"),
+    "win": ("win.wav", 0.4, "round"),
+    "lose": ("lose.wav", 0.4, "round"),
+    "tie": ("tie.wav", 0.4, "round"),
+    "victory": ("victory.wav", 0.6, "match"),
+    "defeat": ("defeat.wav", 0.6, "match"),
+}
+
+# Reserved mixer channels per category. Categories without channels are long
+# clips that are streamed from disk through mixer.music instead of decoded.
+CHANNEL_GROUPS = {"ui": 2, "round": 1}
+
+class AssetManager:
+    # Loads images and sounds on first use instead of at import, so the menu
+    # can appear before everything is decoded. Scaled images are cached on disk
+    # as raw RGBA keyed by the source file hash and target size, which lets
+    # later launches skip decoding and pygame.transform.scale entirely.
+    def __init__(self, asset_dir=ASSET_DIR, cache_dir=CACHE_DIR):
+        self.asset_dir = asset_dir
+        self.cache_dir = cache_dir
+        self.images = {}
+        self.loaded = {}  # Decoded by the background thread, not yet converted
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.queued = set()
+        self.found = {}  # Image name -> whether the file is there
+        self.scaled_sizes = {}  # Image name -> window-dependent sizes in memory, oldest first
+        self.latest_sizes = {}  # Image name -> window-dependent size last asked for
+        self.loaded_sizes = {}  # Image name -> window-dependent key waiting in self.loaded
+        self.thread = None
     
-    rock_img = pygame.image.load("assets/rock.png").convert_alpha()
-    paper_img = pygame.image.load("assets/paper.png").convert_alpha()
-    scissors_img = pygame.image.load("assets/scissors.png").convert_alpha()
+    def key_lock(self, key):
+        with self.lock:
+            return self.locks.setdefault(key, threading.Lock())
     
-    rock_img = pygame.transform.scale(rock_img, (120, 120))
-    paper_img = pygame.transform.scale(paper_img, (120, 120))
-    scissors_img = pygame.transform.scale(scissors_img, (120, 120))
+    def load_surface(self, name, size, persist=True):
+        path = os.path.join(self.asset_dir, name)
+        with open(path, "rb") as f:
+            data = f.read()
+        
+        cache_path = None
+        if size:
+            digest = hashlib.sha1(data).hexdigest()[:16]
+            cache_path = os.path.join(self.cache_dir, f"{digest}-{size[0]}x{size[1]}.rgba")
+            try:
+                with open(cache_path, "rb") as f:
+                    pixels = f.read()
+                if len(pixels) == size[0] * size[1] * 4:
+                    return pygame.image.frombytes(pixels, size, "RGBA")
+            except OSError:
+                pass
+        
+        surface = pygame.image.load(io.BytesIO(data), name)
+        if size:
+            surface = pygame.transform.scale(surface, size)
+            if not persist:
+                return surface
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(pygame.image.tobytes(surface, "RGBA"))
+                os.replace(tmp_path, cache_path)
+            except OSError as e:
+                print(f"Could not write asset cache: {e}")
+        return surface
     
-    # Load sounds if audio is enabled
-    if audio_enabled:
-        try:
-            # Set volume for all sounds (0.0 to 1.0)
-            click_sound = mixer.Sound("assets/click.wav")
-            click_sound.set_volume(0.5)
-            
-            win_sound = mixer.Sound("assets/win.wav")
-            win_sound.set_volume(0.4)
-            
-            lose_sound = mixer.Sound("assets/lose.wav")
-            lose_sound.set_volume(0.4)
-            
-            tie_sound = mixer.Sound("assets/tie.wav")
-            tie_sound.set_volume(0.4)
-            
-            victory_sound = mixer.Sound("assets/victory.wav")
-            victory_sound.set_volume(0.6)
-            
-            defeat_sound = mixer.Sound("assets/defeat.wav")
-            defeat_sound.set_volume(0.6)
-        except Exception as e:
-            print(f"Error loading sound files: {e}")
-            audio_enabled = False
-except Exception as e:
-    print(f"Error loading assets: {e}. Please ensure all required files are in the assets folder.")
-    pygame.quit()
-    sys.exit()
+    def exists(self, name):
+        # For images named by variant files, which may point at missing files
+        found = self.found.get(name)
+        if found is None:
+            found = self.found[name] = os.path.isfile(os.path.join(self.asset_dir, name))
+            if not found:
+                print(f"Image {name} not found in {self.asset_dir}, drawing a token instead")
+        return found
+    
+    def image(self, name, size=None, persist=True):
+        key = (name, size)
+        surface = self.images.get(key)
+        if surface is not None:
+            return surface
+        
+        with self.key_lock(key):
+            surface = self.loaded.pop(key, None)
+            try:
+                if surface is None:
+                    surface = self.load_surface(name, size, persist)
+                surface = surface.convert_alpha()
+            except Exception as e:
+                print(f"Error loading assets: {e}. Please ensure all required files are in the assets folder.")
+                pygame.quit()
+                sys.exit()
+            self.images[key] = surface
+        return surface
+    
+    def scaled(self, name, size):
+        # For sizes that follow the window. A size that is not ready yet is
+        # queued for the background thread and the closest size in memory is
+        # returned meanwhile, so resizing never decodes or scales on the main
+        # thread. ASSETS_READY is posted when the queued sizes are in. Only
+        # the last few sizes of each image are kept, and none go to disk.
+        key = (name, size)
+        surface = self.images.get(key)
+        if surface is not None:
+            return surface
+        if key not in self.loaded:
+            fallbacks = [(abs(other[0] - size[0]) + abs(other[1] - size[1]), surface)
+                         for (other_name, other), surface in list(self.images.items())
+                         if other_name == name and other]
+            if fallbacks:
+                self.preload([key], persist=False)
+                return min(fallbacks, key=lambda item: item[0])[1]
+        
+        # Ready, or nothing to stand in for it
+        surface = self.image(name, size, persist=False)
+        sizes = self.scaled_sizes.setdefault(name, [])
+        sizes.append(size)
+        if len(sizes) > SCALED_SIZES:
+            self.images.pop((name, sizes.pop(0)), None)
+        return surface
+    
+    def preload(self, images, persist=True):
+        # Decode and scale assets on a background thread. Surfaces are
+        # converted to the display format on the main thread the first time
+        # they are used.
+        for key in images:
+            with self.lock:
+                if not persist:
+                    # A window-dependent size replaces the one asked for before
+                    self.latest_sizes[key[0]] = key[1]
+                if key in self.queued:
+                    continue
+                self.queued.add(key)
+            self.requests.put((key, persist))
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name="asset-loader", daemon=True)
+            self.thread.start()
+    
+    def run(self):
+        while True:
+            key, persist = self.requests.get()
+            name, size = key
+            loaded = False
+            with self.key_lock(key):
+                # While the window is being dragged only the latest size is scaled
+                superseded = not persist and self.latest_sizes.get(name) != size
+                if not superseded and key not in self.images and key not in self.loaded:
+                    try:
+                        surface = self.load_surface(name, size, persist)
+                        if not persist:
+                            # Drop the previous window size if it was never drawn
+                            stale = self.loaded_sizes.get(name)
+                            if stale != key:
+                                self.loaded.pop(stale, None)
+                            self.loaded_sizes[name] = key
+                        self.loaded[key] = surface
+                        loaded = True
+                    except Exception:
+                        pass  # Reported when the image is needed on the main thread
+            with self.lock:
+                self.queued.discard(key)
+            if loaded and self.requests.empty() and pygame.display.get_init():
+                pygame.event.post(pygame.event.Event(ASSETS_READY))
+
+assets = AssetManager()
+
+class AudioManager:
+    # Plays each category of sound on its own reserved channels, so a burst of
+    # clicks can never cut off a round result. When a category runs out of
+    # voices its oldest voice is replaced. Long match clips are streamed.
+    def __init__(self, enabled, asset_dir=ASSET_DIR):
+        self.enabled = enabled
+        self.asset_dir = asset_dir
+        self.sounds = {}
+        self.lock = threading.Lock()
+        self.groups = {}
+        self.started = {}
+        self.play_calls = 0
+        self.play_time = 0.0
+        self.max_play_time = 0.0
+        if enabled:
+            first = 0
+            for category, voices in CHANNEL_GROUPS.items():
+                self.groups[category] = [mixer.Channel(i) for i in range(first, first + voices)]
+                first += voices
+            mixer.set_num_channels(max(first, mixer.get_num_channels()))
+            mixer.set_reserved(first)
+    
+    def path(self, name):
+        return os.path.join(self.asset_dir, SOUNDS[name][0])
+    
+    def load(self, name):
+        sound = self.sounds.get(name)
+        if sound is not None or not self.enabled:
+            return sound
+        
+        with self.lock:
+            if name not in self.sounds:
+                filename, volume, category = SOUNDS[name]
+                try:
+                    sound = mixer.Sound(self.path(name))
+                    sound.set_volume(volume)
+                except Exception as e:
+                    print(f"Error loading sound files: {e}")
+                    self.enabled = False
+                    return None
+                self.sounds[name] = sound
+        return self.sounds[name]
+    
+    def play(self, name):
+        if not self.enabled:
+            return
+        start = time.perf_counter()
+        filename, volume, category = SOUNDS[name]
+        if category in self.groups:
+            sound = self.load(name)
+            if sound is None:
+                return
+            channels = self.groups[category]
+            channel = next((c for c in channels if not c.get_busy()), None)
+            if channel is None:
+                channel = min(channels, key=lambda c: self.started.get(c, 0))
+            channel.play(sound)
+            self.started[channel] = start
+        else:
+            try:
+                mixer.music.load(self.path(name))
+                mixer.music.set_volume(volume)
+                mixer.music.play()
+            except pygame.error as e:
+                print(f"Error streaming {filename}: {e}")
+                return
+        
+        elapsed = time.perf_counter() - start
+        self.play_calls += 1
+        self.play_time += elapsed
+        self.max_play_time = max(self.max_play_time, elapsed)
+    
+    def preload(self):
+        # Decode the short clips in the background, streamed ones are never decoded
+        def run():
+            for name, (filename, volume, category) in SOUNDS.items():
+                if category in self.groups:
+                    self.load(name)
+        
+        if self.enabled:
+            threading.Thread(target=run, name="audio-preload", daemon=True).start()
+    
+    def stats(self):
+        # Decoded PCM held in memory and how long playback takes to start
+        frequency, size, channels = mixer.get_init() or (AUDIO_FREQUENCY, -16, 2)
+        bytes_per_second = frequency * channels * abs(size) // 8
+        decoded = sum(int(sound.get_length() * bytes_per_second) for sound in list(self.sounds.values()))
+        return {
+            "decoded_bytes": decoded,
+            "decoded_sounds": len(self.sounds),
+            "streamed_sounds": sum(1 for f, v, category in SOUNDS.values() if category not in self.groups),
+            "buffer_latency_ms": AUDIO_BUFFER / frequency * 1000,
+            "avg_play_call_ms": self.play_time / self.play_calls * 1000 if self.play_calls else 0.0,
+            "max_play_call_ms": self.max_play_time * 1000,
+        }
+
+audio = AudioManager(audio_enabled)
+
+def play_sound(name):
+    audio.play(name)
+
+class TextCache:
+    # One Font object per size plus a bounded LRU of rendered text surfaces.
+    # Most strings on screen never change, so re-rendering them every frame
+    # is wasted work.
+    def __init__(self, max_surfaces=256):
+        self.max_surfaces = max_surfaces
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = pygame.font.Font(None, size)
+            self.fonts[size] = font
+        return font
+    
+    def render(self, text, size, color, antialias=True):
+        key = (text, size, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        
+        self.misses += 1
+        surface = self.font(size).render(text, antialias, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+    
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "fonts": len(self.fonts), "surfaces": len(self.surfaces)}
+    
+    def clear(self):
+        self.fonts.clear()
+        self.surfaces.clear()
+        self.hits = 0
+        self.misses = 0
+
+text_cache = TextCache()
+
+# Moves without artwork get a generated token, a disc in a colour derived from
+# the move name with the name written across it. Built once per name and size.
+move_tokens = {}
+
+def move_image(variant, move, size):
+    image = variant.images[move]
+    if image and assets.exists(image):
+        return assets.scaled(image, size)
+    key = (variant.moves[move], size)
+    token = move_tokens.get(key)
+    if token is None:
+        token = move_tokens[key] = build_move_token(*key)
+    return token
+
+def build_move_token(name, size):
+    color = pygame.Color(0)
+    color.hsva = (int(hashlib.sha1(name.encode()).hexdigest()[:4], 16) % 360, 60, 85, 100)
+    token = pygame.Surface(size, pygame.SRCALPHA)
+    center = (size[0] // 2, size[1] // 2)
+    radius = min(size) // 2
+    pygame.draw.circle(token, color, center, radius)
+    pygame.draw.circle(token, WHITE, center, radius, max(1, radius // 12))
+    
+    text = text_cache.font(max(10, size[1] // 5)).render(name.upper(), True, WHITE)
+    max_width = int(size[0] * 0.85)
+    if text.get_width() > max_width:
+        height = max(1, text.get_height() * max_width // text.get_width())
+        text = pygame.transform.smoothscale(text, (max_width, height))
+    token.blit(text, text.get_rect(center=center))
+    return token.convert_alpha()
+
+class DirtyRegions:
+    # Collects the screen rectangles touched since the last present so the
+    # main loop can push only those with display.update() and skip idle frames.
+    def __init__(self, bounds):
+        self.bounds = pygame.Rect(bounds)
+        self.rects = []
+        self.full = True
+    
+    def mark(self, rect):
+        if self.full:
+            return
+        rect = pygame.Rect(rect).clip(self.bounds)
+        if rect.width and rect.height:
+            self.rects.append(rect)
+    
+    def mark_all(self):
+        self.full = True
+        self.rects = []
+    
+    def __bool__(self):
+        return self.full or bool(self.rects)
+    
+    def flush(self):
+        if self.full:
+            rects = [self.bounds.copy()]
+        else:
+            # Merge overlapping rectangles so each pixel is pushed once
+            rects = []
+            for rect in self.rects:
+                i = 0
+                while i < len(rects):
+                    if rect.colliderect(rects[i]):
+                        rect = rect.union(rects.pop(i))
+                        i = 0
+                    else:
+                        i += 1
+                rects.append(rect)
+        self.rects = []
+        self.full = False
+        return rects
+
+dirty = DirtyRegions(screen.get_rect())
+
+class LayerCache:
+    # Static parts of a screen rendered once and reused every frame. A layer is
+    # rebuilt only when the inputs passed alongside it change.
+    def __init__(self):
+        self.layers = {}
+        self.builds = 0
+    
+    def get(self, name, build, *inputs):
+        entry = self.layers.get(name)
+        if entry is None or entry[0] != inputs:
+            entry = (inputs, build(*inputs))
+            self.layers[name] = entry
+            self.builds += 1
+        return entry[1]
+    
+    def invalidate(self, name=None):
+        if name is None:
+            self.layers.clear()
+        else:
+            self.layers.pop(name, None)
+
+layers = LayerCache()
+
+class Atlas:
+    # Packs sprites into a few large pages, so a frame's sprites come from the
+    # same surfaces and can be drawn by one Surface.blits call. Sprites are
+    # added the first time they are asked for, left to right along shelves;
+    # regions maps each key to its (page, rect).
+    def __init__(self, page_size=(1024, 1024), padding=1):
+        self.page_size = page_size
+        self.padding = padding
+        self.clear()
+    
+    def clear(self):
+        self.pages = []
+        self.regions = {}
+        self.shelf_x = self.shelf_y = self.shelf_height = 0
+    
+    def get(self, key, build):
+        region = self.regions.get(key)
+        if region is None:
+            region = self.regions[key] = self.pack(build())
+        return region
+    
+    def pack(self, surface):
+        width, height = surface.get_size()
+        page_width, page_height = self.page_size
+        if width > page_width or height > page_height:
+            return surface, surface.get_rect()
+        if self.shelf_x + width > page_width:
+            self.shelf_x = 0
+            self.shelf_y += self.shelf_height
+            self.shelf_height = 0
+        if not self.pages or self.shelf_y + height > page_height:
+            self.pages.append(pygame.Surface(self.page_size, pygame.SRCALPHA).convert_alpha())
+            self.shelf_x = self.shelf_y = self.shelf_height = 0
+        
+        page = self.pages[-1]
+        rect = pygame.Rect(self.shelf_x, self.shelf_y, width, height)
+        # Copy the pixels as they are, alpha included, rather than blending
+        page.blit(surface, rect, special_flags=pygame.BLEND_RGBA_MAX)
+        self.shelf_x += width + self.padding
+        self.shelf_height = max(self.shelf_height, height + self.padding)
+        return page, rect
+
+atlas = Atlas()
+
+# Hover outline drawn around image buttons, baked into their hover sprites
+OUTLINE_MARGIN = 5
+
+def sprite(image):
+    return atlas.get(image, lambda: image)
+
+def hover_sprite(image):
+    return atlas.get((image, "hover"), partial(build_hover_sprite, image))
+
+def build_hover_sprite(image):
+    width, height = image.get_size()
+    margin = view.length(OUTLINE_MARGIN)
+    hover = pygame.Surface((width + 2 * margin, height + 2 * margin), pygame.SRCALPHA)
+    hover.blit(image, (margin, margin), special_flags=pygame.BLEND_RGBA_MAX)
+    pygame.draw.rect(hover, GOLD, hover.get_rect(), view.length(3), border_radius=view.length(10))
+    return hover
+
+def build_text_button(size, text, color):
+    button = pygame.Surface(size, pygame.SRCALPHA)
+    pygame.draw.rect(button, color, button.get_rect(), border_radius=view.length(12))
+    text_surface = text_cache.render(text, view.font(36), WHITE)
+    button.blit(text_surface, text_surface.get_rect(center=button.get_rect().center))
+    return button
+
+class SpriteBatch:
+    # Blits queued while drawing a frame, submitted in order by a single
+    # Surface.blits call instead of one Python-level blit each
+    def __init__(self):
+        self.items = []
+    
+    def add(self, surface, dest, area=None):
+        self.items.append((surface, dest) if area is None else (surface, dest, area))
+    
+    def add_sprite(self, region, dest):
+        self.items.append((region[0], dest, region[1]))
+    
+    def flush(self, target):
+        if self.items:
+            target.blits(self.items, doreturn=False)
+            self.items.clear()
+
+batch = SpriteBatch()
+
+def crop_layer(canvas):
+    # Trim a full-screen canvas to its drawn pixels, returns (surface, position)
+    rect = canvas.get_bounding_rect()
+    return canvas.subsurface(rect).copy(), rect.topleft
+
+# How the classic moves win, every other pairing just "beats"
+RULE_VERBS = {("rock", "scissors"): "crushes", ("paper", "rock"): "covers", ("scissors", "paper"): "cut"}
+MAX_RULE_LINES = 5  # Bigger variants get a one-line summary
+MENU_TEXT_HEIGHT = 250  # Room between the subtitle and the buttons
+
+def menu_lines(variant):
+    # The menu's description of the game, with one line per move's rules
+    if variant is engine.CLASSIC:
+        intro = ["Challenge the computer in the classic game",
+                 f"of {variant.title.replace(' ', '-')} with a modern twist."]
+    else:
+        intro = ["Challenge the computer in a game", f"of {variant.title}."]
+    rules = []
+    for move, name in enumerate(variant.moves):
+        beaten = variant.beaten(move)
+        if beaten:
+            verb = "beat" if name.endswith("s") else "beats"  # Scissors beat, Rock beats
+            if len(beaten) == 1:
+                verb = RULE_VERBS.get((name, variant.moves[beaten[0]]), verb)
+            rules.append(f"- {name.title()} {verb} {' and '.join(variant.moves[m].title() for m in beaten)}")
+    if len(rules) > MAX_RULE_LINES:
+        counts = {len(variant.beaten(move)) for move in range(len(variant))}
+        rules = [f"- {len(variant)} moves, each beats {counts.pop()} of the others" if len(counts) == 1
+                 else f"- {len(variant)} moves, each beats some of the others"]
+    return ["A strategic battle of hands!", *intro, "", "Rules:", *rules, "",
+            f"First to {engine.WINS_NEEDED} wins becomes the ultimate champion!"]
+
+STAR_POINTS = [(10, 0), (12, 7), (20, 7), (14, 12), (16, 20),
+               (10, 15), (4, 20), (6, 12), (0, 7), (8, 7)]
+
+# Layers are laid out for the size they are built at, which need not be the window's
+
+def build_menu_layer(size, variant):
+    view = View(size)
+    canvas = pygame.Surface(size, pygame.SRCALPHA)
+    
+    # Draw title, long variant names get a smaller subtitle so they fit
+    title = text_cache.render("BEAT THE HAND", view.font(72), GOLD)
+    subtitle_size = 72
+    while subtitle_size > 36 and text_cache.font(view.font(subtitle_size)).size(variant.title)[0] > \
+            view.length(WINDOW_WIDTH - 40):
+        subtitle_size -= 4
+    subtitle = text_cache.render(variant.title, view.font(subtitle_size), ORANGE)
+    canvas.blit(title, title.get_rect(center=view.point(WINDOW_WIDTH//2, 140)))
+    canvas.blit(subtitle, subtitle.get_rect(center=view.point(WINDOW_WIDTH//2, 200)))
+    
+    # Draw game info
+    lines = menu_lines(variant)
+    spacing = min(25, MENU_TEXT_HEIGHT // len(lines))
+    for i, line in enumerate(lines):
+        text = text_cache.render(line, view.font(28), WHITE)
+        canvas.blit(text, view.centered(text, 240 + i*spacing))
+    return crop_layer(canvas)
+
+def build_scoreboard_layer(size):
+    view = View(size)
+    canvas = pygame.Surface(size, pygame.SRCALPHA)
+    
+    # Draw scoreboard background
+    scoreboard_rect = view.rect(20, 20, WINDOW_WIDTH - 40, 80)
+    pygame.draw.rect(canvas, (30, 30, 60), scoreboard_rect, border_radius=view.length(15))
+    pygame.draw.rect(canvas, PURPLE, scoreboard_rect, view.length(3), border_radius=view.length(15))
+    
+    # Draw scoreboard title
+    title = text_cache.render("SCOREBOARD (First to 5 wins)", view.font(32), GOLD)
+    canvas.blit(title, view.centered(title, 30))
+    return crop_layer(canvas)
+
+def build_overlay_layer(size):
+    # Alpha is applied per frame with set_alpha, so the fill stays opaque here
+    overlay = pygame.Surface(size).convert()
+    overlay.fill(BLACK)
+    return overlay
+
+def build_popup_layer(size, fill, border, title_text, instruction_text, stars):
+    view = View(size)
+    canvas = pygame.Surface(size, pygame.SRCALPHA)
+    
+    # Draw popup
+    popup_rect = pygame.Rect(0, 0, 600, 300)
+    popup_rect.center = (WINDOW_WIDTH//2, WINDOW_HEIGHT//2)
+    pygame.draw.rect(canvas, fill, view.rect(popup_rect), border_radius=view.length(20))
+    pygame.draw.rect(canvas, border, view.rect(popup_rect), view.length(4), border_radius=view.length(20))
+    
+    # Draw stars decoration
+    if stars:
+        star_img = pygame.Surface((view.length(20), view.length(20)), pygame.SRCALPHA)
+        pygame.draw.polygon(star_img, GOLD, [(x * view.scale, y * view.scale) for x, y in STAR_POINTS])
+        for i in range(8):
+            direction = pygame.math.Vector2(1, 0).rotate(i * 45)
+            pos_x = WINDOW_WIDTH//2 + 250 * direction.x
+            pos_y = WINDOW_HEIGHT//2 + 150 * direction.y
+            canvas.blit(star_img, view.point(pos_x - 10, pos_y - 10))
+    
+    # Draw text
+    title = text_cache.render(title_text, view.font(72), border)
+    canvas.blit(title, view.centered(title, popup_rect.y + 30))
+    
+    instruction = text_cache.render(instruction_text, view.font(28), WHITE)
+    canvas.blit(instruction, view.centered(instruction, popup_rect.y + 180))
+    return crop_layer(canvas)
 
 class Button:
     def __init__(self, x, y, width, height, text, image=None, color=None, hover_color=None):
-        self.rect = pygame.Rect(x, y, width, height)
+        self.layout_rect = pygame.Rect(x, y, width, height)
         self.text = text
-        self.image = image
+        self._image = image  # A surface, or a callable taking the button's size in pixels
         self.color = color if color else BLUE
         self.hover_color = hover_color if hover_color else DARK_BLUE
         self.is_hovered = False
-        self.original_y = y
-        self.current_y = y
         self.bounce_speed = 0
         self.was_hovered = False
-        
-    def draw(self, surface):
+        self.place()
+    
+    def place(self):
+        # Screen position for the current window size
+        self.rect = view.rect(self.layout_rect)
+        self.original_y = self.current_y = self.rect.y
+        self.bounce_speed = 0
+    
+    @property
+    def image(self):
+        return self._image(self.rect.size) if callable(self._image) else self._image
+    
+    def area(self):
+        # Screen region covered by the button, including the hover outline
         if self.image:
             img_rect = self.image.get_rect(center=(self.rect.centerx, self.current_y))
-            surface.blit(self.image, img_rect)
-            
-            if self.is_hovered:
-                pygame.draw.rect(surface, GOLD, (img_rect.x-5, img_rect.y-5, 
-                                img_rect.width+10, img_rect.height+10), 3, border_radius=10)
+            return img_rect.inflate(view.length(12), view.length(12))
+        return self.rect.copy()
+        
+    def draw(self, batch):
+        # Image buttons draw their sprite or its outlined hover variant, both
+        # centered on the bounce position; text buttons are one sprite each
+        image = self.image
+        if image:
+            region = hover_sprite(image) if self.is_hovered else sprite(image)
+            dest = region[1].copy()
+            dest.center = (self.rect.centerx, self.current_y)
+            batch.add_sprite(region, dest.topleft)
         else:
             color = self.hover_color if self.is_hovered else self.color
-            pygame.draw.rect(surface, color, self.rect, border_radius=12)
-            
-            font = pygame.font.Font(None, 36)
-            text_surface = font.render(self.text, True, WHITE)
-            text_rect = text_surface.get_rect(center=self.rect.center)
-            surface.blit(text_surface, text_rect)
+            batch.add_sprite(atlas.get(("button", self.rect.size, self.text, color),
+                                       partial(build_text_button, self.rect.size, self.text, color)),
+                             self.rect.topleft)
     
-    def update(self):
+    def is_animating(self):
+        # Text buttons do not move, only image buttons bounce on screen
+        return bool(self.image) and (self.is_hovered or self.bounce_speed != 0)
+    
+    def update(self, dt):
+        previous_y = self.current_y
         if self.is_hovered and self.bounce_speed == 0:
-            self.bounce_speed = -5
+            self.bounce_speed = BOUNCE_VELOCITY * view.scale
         elif not self.is_hovered and self.current_y != self.original_y:
             self.current_y = self.original_y
         
         if self.bounce_speed != 0:
-            self.current_y += self.bounce_speed
-            self.bounce_speed += 0.3
+            self.current_y += self.bounce_speed * dt
+            self.bounce_speed += BOUNCE_GRAVITY * view.scale * dt
             if self.current_y >= self.original_y:
                 self.current_y = self.original_y
                 self.bounce_speed = 0
+        
+        # Only a button that moved looks up its image
+        if self.current_y != previous_y and self.image:
+            area = self.area()
+            dirty.mark(area.union(area.move(0, previous_y - self.current_y)))
     
-    def handle_event(self, event):
+    def set_hovered(self, hovered):
+        self.was_hovered = self.is_hovered
+        self.is_hovered = hovered
+        if self.is_hovered != self.was_hovered:
+            dirty.mark(self.area())
+
+class HitIndex:
+    # Uniform grid mapping each cell to the buttons overlapping it, so a point
+    # lookup only tests the buttons in one cell instead of every button.
+    def __init__(self, buttons, cell_size=100):
+        self.cell_size = cell_size
+        self.cells = {}
+        for button in buttons:
+            rect = button.rect
+            for cx in range(rect.left // cell_size, (rect.right - 1) // cell_size + 1):
+                for cy in range(rect.top // cell_size, (rect.bottom - 1) // cell_size + 1):
+                    self.cells.setdefault((cx, cy), []).append(button)
+    
+    def at(self, pos):
+        cell = (pos[0] // self.cell_size, pos[1] // self.cell_size)
+        for button in self.cells.get(cell, ()):
+            if button.rect.collidepoint(pos):
+                return button
+        return None
+
+# Up to this many moves sit in one row with a label under each, larger
+# variants fill a grid of square buttons sized to fit the choice panel
+ROW_MOVES = 5
+CHOICE_PANEL = pygame.Rect(20, 225, WINDOW_WIDTH - 40, WINDOW_HEIGHT - 235)
+
+def grid_cell(count, panel):
+    # Largest square cell size that fits count cells in the panel
+    cell = min(panel.width, panel.height)
+    while cell > 1 and (panel.width // cell) * (panel.height // cell) < count:
+        cell -= 1
+    return cell
+
+class ChoiceLayout:
+    # Choice buttons, labels and reveal positions for one variant, generated
+    # from its move list so no move needs code of its own. Positions are in
+    # layout coordinates.
+    def __init__(self, variant):
+        self.variant = variant
+        count = len(variant)
+        if count <= ROW_MOVES:
+            size = HAND_SIZE[0]
+            spacing = min(220, WINDOW_WIDTH // count)
+            centers = [(WINDOW_WIDTH // 2 + round((i - (count - 1) / 2) * spacing), 460) for i in range(count)]
+            self.labels = tuple(text_cache.render(move.upper(), view.font(36), WHITE) for move in variant.moves)
+            self.reveal_x = tuple((x - HAND_SIZE[0] // 2,) * 2 for x, y in centers)
+        else:
+            cell = grid_cell(count, CHOICE_PANEL)
+            columns = CHOICE_PANEL.width // cell
+            rows = -(-count // columns)
+            left = CHOICE_PANEL.centerx - columns * cell // 2
+            top = CHOICE_PANEL.centery - rows * cell // 2
+            size = cell - max(2, cell // 10)
+            centers = [(left + (i % columns) * cell + cell // 2, top + (i // columns) * cell + cell // 2)
+                       for i in range(count)]
+            self.labels = None
+            # The two revealed hands stand apart instead of over their buttons
+            sides = (WINDOW_WIDTH // 3 - HAND_SIZE[0] // 2, WINDOW_WIDTH * 2 // 3 - HAND_SIZE[0] // 2)
+            self.reveal_x = (sides,) * count
+        
+        self.buttons = tuple(Button(x - size // 2, y - size // 2, size, size, "", partial(move_image, variant, move))
+                             for move, (x, y) in enumerate(centers))
+        self.moves = {button: move for move, button in enumerate(self.buttons)}
+    
+    def draw(self, batch):
+        for button in self.buttons:
+            button.draw(batch)
+        if self.labels:
+            for button, label in zip(self.buttons, self.labels):
+                batch.add(label, view.centered(label, 530, button.layout_rect.centerx))
+
+# Everything else is dropped by SDL before it reaches the Python event queue
+ALLOWED_EVENTS = [pygame.QUIT, pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.WINDOWEXPOSED,
+                  pygame.KEYDOWN, pygame.VIDEORESIZE, ASSETS_READY]
+
+# Hotkeys
+OVERLAY_KEY = pygame.K_F3
+TRACE_KEY = pygame.K_F4
+FULLSCREEN_KEY = pygame.K_F11
+
+profiler = Profiler()
+PROFILER_RECT = pygame.Rect(10, 110, 260, 178)
+GRAPH_FRAMES = 120
+
+def draw_profiler_overlay(surface):
+    # Rolling graph of per-frame work with the 60 FPS budget marked, the
+    # average time of each instrumented phase over the last second, how well
+    # the text cache is doing and what audio costs
+    panel = layers.get("profiler", build_profiler_panel, PROFILER_RECT.size)
+    surface.blit(panel, PROFILER_RECT)
+    
+    graph = pygame.Rect(PROFILER_RECT.x + 8, PROFILER_RECT.y + 8, PROFILER_RECT.width - 16, 50)
+    scale = graph.height / (2000 / FPS)  # The graph tops out at two frame budgets
+    budget_y = graph.bottom - (1000 / FPS) * scale
+    pygame.draw.line(surface, RED, (graph.x, budget_y), (graph.right, budget_y))
+    bar_width = graph.width / GRAPH_FRAMES
+    for i, ms in enumerate(profiler.frame_times(GRAPH_FRAMES)):
+        height = min(graph.height, ms * scale)
+        color = GREEN if ms <= 1000 / FPS else ORANGE
+        pygame.draw.rect(surface, color, (graph.x + i * bar_width, graph.bottom - height,
+                                          max(1, bar_width), height))
+    
+    # These strings change every frame, keep them out of the text cache
+    font = text_cache.font(20)
+    times = profiler.frame_times(60)
+    average = sum(times) / len(times) if times else 0
+    lines = [f"frame {average:.2f} ms  max {max(times, default=0):.2f} ms"]
+    phases = sorted(profiler.phase_times().items(), key=lambda item: -item[1])
+    lines += [f"{name} {ms:.2f} ms" for name, ms in phases[:5]]
+    text = text_cache.stats()
+    lookups = text["hits"] + text["misses"]
+    lines.append(f"text {text['hits'] / lookups if lookups else 0:.0%} hits, "
+                 f"{text['surfaces']} surfaces, {text['fonts']} fonts")
+    if audio.enabled:
+        sound = audio.stats()
+        lines.append(f"audio {sound['decoded_bytes'] / 1024:.0f} KB, play {sound['avg_play_call_ms']:.2f} ms, "
+                     f"max {sound['max_play_call_ms']:.2f}")
+    else:
+        lines.append("audio off")
+    for i, line in enumerate(lines):
+        surface.blit(font.render(line, True, WHITE), (graph.x, graph.bottom + 6 + i * 14))
+    dirty.mark(PROFILER_RECT)
+
+def build_profiler_panel(size):
+    panel = pygame.Surface(size).convert()
+    panel.fill((10, 10, 30))
+    panel.set_alpha(200)
+    return panel
+
+def coalesce_events(events):
+    # Collapse each run of MOUSEMOTION events into the latest one. Other events
+    # keep their order, so a click still sees the position that preceded it.
+    motion = None
+    for event in events:
         if event.type == pygame.MOUSEMOTION:
-            self.was_hovered = self.is_hovered
-            self.is_hovered = self.rect.collidepoint(event.pos)
-        
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            if self.is_hovered:
-                if audio_enabled:
-                    click_sound.play()
-                return True
-        return False
+            motion = event
+            continue
+        if motion is not None:
+            yield motion
+            motion = None
+        yield event
+    if motion is not None:
+        yield motion
 
-class Game:
+CHOICE_AREA = pygame.Rect(0, 240, WINDOW_WIDTH, 190)
+
+# What a round leads to, indexed by outcome and then by whether it ended the
+# match: (result text, next state, sound)
+ROUND_RESULTS = (
+    (("It's a tie!", RESULT, "tie"),) * 2,
+    (("You win this round!", RESULT, "win"), ("You won the match!", VICTORY, "victory")),
+    (("Computer wins this round!", RESULT, "lose"), ("Computer won the match!", DEFEAT, "defeat")),
+)
+
+class Widgets:
+    # The buttons and pointer state of the screen. Only one game is shown at a
+    # time, so every Game shares this instead of owning its own buttons.
     def __init__(self):
-        self.state = MENU
-        self.player_choice = None
-        self.computer_choice = None
-        self.result = None
-        self.scores = {"player": 0, "computer": 0, "draws": 0}
-        self.choice_made = False
-        self.computer_reveal_timer = 0
-        self.computer_revealed = False
-        self.match_winner = None
-        self.victory_sound_played = False
-        self.defeat_sound_played = False
-        self.popup_alpha = 0
-        
-        # Create buttons
         button_width = 200
         button_height = 60
         center_x = WINDOW_WIDTH // 2 - button_width // 2
@@ -165,343 +969,438 @@ class Game:
         self.quit_button = Button(center_x + 110, 500, button_width, button_height, "Quit", 
                                 color=RED, hover_color=(150, 0, 0))
         
-        # Choice buttons
-        self.rock_button = Button(120, 400, 120, 120, "", rock_img)
-        self.paper_button = Button(340, 400, 120, 120, "", paper_img)
-        self.scissors_button = Button(560, 400, 120, 120, "", scissors_img)
-        
         self.play_again_button = Button(center_x, 450, button_width, button_height, "Play Again",
                                       color=GREEN, hover_color=(0, 150, 0))
         self.menu_button = Button(center_x, 530, button_width, button_height, "Main Menu",
                                 color=BLUE, hover_color=DARK_BLUE)
         self.next_match_button = Button(center_x, 400, button_width, button_height, "Next Match",
                                       color=GREEN, hover_color=(0, 150, 0))
+        
+        self.choice_layouts = {}
+        self.hovered = None
+        self.mouse_pos = (-1, -1)
+        self.hit_indexes = {}
+    
+    def place(self):
+        # Moves every button to its spot for the current window size. Choice
+        # layouts and hit indexes are rebuilt on demand at the new positions.
+        self.hover(None)
+        for button in (self.play_button, self.quit_button, self.play_again_button,
+                       self.menu_button, self.next_match_button):
+            button.place()
+        self.choice_layouts.clear()
+        self.hit_indexes.clear()
+    
+    def choice_layout(self, variant):
+        layout = self.choice_layouts.get(variant)
+        if layout is None:
+            layout = self.choice_layouts[variant] = ChoiceLayout(variant)
+        return layout
+    
+    def hit_index(self, key, buttons):
+        # One index per screen layout, built the first time it is needed
+        index = self.hit_indexes.get(key)
+        if index is None:
+            index = self.hit_indexes[key] = HitIndex(buttons)
+        return index
+    
+    def hover(self, button):
+        if button is not self.hovered:
+            if self.hovered:
+                self.hovered.set_hovered(False)
+            if button:
+                button.set_hovered(True)
+            self.hovered = button
+
+widgets = Widgets()
+
+def resize():
+    # Lays everything out again if the window size changed, returns whether
+    # it did. Sprites and layers are rebuilt at the new scale, images are
+    # rescaled in the background.
+    global screen
+    screen = pygame.display.get_surface()
+    if screen.get_size() == view.size:
+        return False
+    view.resize(screen.get_size())
+    dirty.bounds = screen.get_rect()
+    atlas.clear()
+    move_tokens.clear()
+    widgets.place()
+    dirty.mark_all()
+    assets.preload([("background.png", screen.get_size())], persist=False)
+    return True
+
+def toggle_fullscreen():
+    if screen.get_flags() & pygame.FULLSCREEN:
+        pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.RESIZABLE)
+    else:
+        pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    return resize()
+
+def parse_size(text):
+    try:
+        width, height = (int(n) for n in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got {text!r}")
+    if width < 1 or height < 1:
+        raise argparse.ArgumentTypeError(f"expected a positive size, got {text!r}")
+    return width, height
+
+NO_MOVE = -1
+
+# Unseeded random play keeps no state of its own, so games created without a
+# strategy share one per variant rather than each carrying a Mersenne Twister
+default_strategies = {}
+
+def default_strategy(variant):
+    strategy = default_strategies.get(variant)
+    if strategy is None:
+        strategy = default_strategies[variant] = strategies.RandomStrategy(variant=variant)
+    return strategy
+
+# Fixed-width image of a game's state for snapshot() and restore(): state,
+# player move, computer move, outcome, flags, the three scores, reveal timer,
+# game clock and the two animation positions plus popup alpha
+SNAPSHOT = struct.Struct("<BhhbBHHHqqfff")
+CHOICE_MADE, COMPUTER_REVEALED, QUIT_REQUESTED = 1, 2, 4
+
+class Game:
+    # Only the match itself lives on the instance, in slots holding small ints,
+    # so many games fit in one process. Moves are indices into the variant.
+    # A game draws through its view, reports changes to its dirty regions and
+    # plays its sounds through sounds, all the window's unless it is shown
+    # somewhere else.
+    __slots__ = ("variant", "strategy", "history", "recorder", "view", "dirty", "sounds", "time_ms", "_state",
+                 "player_choice", "computer_choice", "outcome", "match", "choice_made", "computer_reveal_timer",
+                 "computer_revealed", "quit_requested", "popup_alpha", "player_choice_anim", "computer_choice_anim")
+    
+    def __init__(self, strategy=None, history_log=None, recorder=None, variant=engine.CLASSIC, view=view, dirty=dirty,
+                 sounds=play_sound):
+        self.variant = variant
+        self.view = view
+        self.dirty = dirty
+        self.sounds = sounds
+        self.strategy = strategy if strategy else default_strategy(variant)
+        self.history = history_log
+        self.recorder = recorder
+        # Game clock in milliseconds, set once per frame by the loop driving the
+        # game so every decision in a frame sees the same time
+        self.time_ms = 0
+        self.state = MENU
+        self.match = engine.Match(variant=variant)
+        self.computer_reveal_timer = 0
+        self.quit_requested = False
+        self.popup_alpha = 0
+        self.reset_round()
+    
+    @property
+    def state(self):
+        return self._state
+    
+    @state.setter
+    def state(self, value):
+        # Every state has its own layout, so a transition repaints everything
+        self._state = value
+        self.dirty.mark_all()
+    
+    @property
+    def state_name(self):
+        return STATE_NAMES[self._state]
+    
+    @property
+    def scores(self):
+        return self.match.scores
+    
+    @property
+    def result(self):
+        if self.outcome is None:
+            return None
+        return ROUND_RESULTS[self.outcome][self.match.finished][0]
+    
+    def snapshot(self):
+        # The match state as bytes. The strategy is not included, it keeps
+        # learning across whatever state the game is restored to.
+        match = self.match
+        flags = (self.choice_made * CHOICE_MADE | self.computer_revealed * COMPUTER_REVEALED
+                 | self.quit_requested * QUIT_REQUESTED)
+        return SNAPSHOT.pack(self._state, NO_MOVE if self.player_choice is None else self.player_choice,
+                             NO_MOVE if self.computer_choice is None else self.computer_choice,
+                             NO_MOVE if self.outcome is None else self.outcome, flags,
+                             match.player, match.computer, match.draws, self.computer_reveal_timer,
+                             self.time_ms, self.player_choice_anim, self.computer_choice_anim, self.popup_alpha)
+    
+    def restore(self, data):
+        (state, player_choice, computer_choice, outcome, flags, player, computer, draws, self.computer_reveal_timer,
+         self.time_ms, self.player_choice_anim, self.computer_choice_anim, self.popup_alpha) = SNAPSHOT.unpack(data)
+        self.state = state
+        self.player_choice = None if player_choice == NO_MOVE else player_choice
+        self.computer_choice = None if computer_choice == NO_MOVE else computer_choice
+        self.outcome = None if outcome == NO_MOVE else outcome
+        self.choice_made = bool(flags & CHOICE_MADE)
+        self.computer_revealed = bool(flags & COMPUTER_REVEALED)
+        self.quit_requested = bool(flags & QUIT_REQUESTED)
+        self.match.player, self.match.computer, self.match.draws = player, computer, draws
+    
+    def hit_index(self):
+        return widgets.hit_index((self._state, self.choice_made, self.variant), self.visible_buttons())
+    
+    def handle_event(self, event):
+        if self.recorder:
+            self.recorder.event(self.time_ms, event)
+        if event.type == pygame.MOUSEMOTION:
+            widgets.mouse_pos = event.pos
+            widgets.hover(self.hit_index().at(event.pos))
+        elif event.type == pygame.MOUSEBUTTONDOWN:
+            widgets.mouse_pos = event.pos
+            button = self.hit_index().at(event.pos)
+            widgets.hover(button)
+            if button:
+                self.sounds("click")
+                if self.state == MENU:
+                    self.handle_menu(button)
+                elif self.state == PLAYING:
+                    self.handle_playing(button)
+                elif self.state == RESULT:
+                    self.handle_result(button)
+                elif self.state in (VICTORY, DEFEAT):
+                    self.handle_victory_defeat(button)
+                # The layout may have changed under a still pointer
+                widgets.hover(self.hit_index().at(widgets.mouse_pos))
+    
+    def visible_buttons(self):
+        if self.state == MENU:
+            return (widgets.play_button, widgets.quit_button)
+        if self.state == PLAYING:
+            if self.choice_made:
+                return ()
+            return widgets.choice_layout(self.variant).buttons
+        if self.state == RESULT:
+            return (widgets.play_again_button, widgets.menu_button)
+        return (widgets.next_match_button, widgets.menu_button)
     
     def reset_scores(self):
-        self.scores = {"player": 0, "computer": 0, "draws": 0}
+        self.match.reset()
+        if self.history:
+            self.history.new_match()
     
     def reset_match(self):
         self.reset_scores()
         self.reset_round()
-        self.victory_sound_played = False
-        self.defeat_sound_played = False
     
-    def handle_menu(self, event):
-        if self.play_button.handle_event(event):
+    def handle_menu(self, button):
+        if button is widgets.play_button:
             self.state = PLAYING
             self.reset_match()
-        elif self.quit_button.handle_event(event):
-            pygame.quit()
-            sys.exit()
+        elif button is widgets.quit_button:
+            # The loop driving the game decides what quitting means
+            self.quit_requested = True
     
-    def handle_playing(self, event):
-        if not self.choice_made:
-            if self.rock_button.handle_event(event):
-                self.make_choice("rock")
-            elif self.paper_button.handle_event(event):
-                self.make_choice("paper")
-            elif self.scissors_button.handle_event(event):
-                self.make_choice("scissors")
-    
-    def handle_result(self, event):
-        if self.play_again_button.handle_event(event):
-            self.state = PLAYING
-            self.reset_round()
-        elif self.menu_button.handle_event(event):
+    def handle_playing(self, button):
+        move = widgets.choice_layout(self.variant).moves.get(button)
+        if not self.choice_made and move is not None:
+            self.make_choice(move)
+    
+    def handle_result(self, button):
+        if button is widgets.play_again_button:
+            self.play_next()
+        elif button is widgets.menu_button:
             self.state = MENU
             self.reset_round()
             self.reset_scores()
     
-    def handle_victory_defeat(self, event):
-        if self.next_match_button.handle_event(event):
-            self.state = PLAYING
-            self.reset_match()
-        elif self.menu_button.handle_event(event):
+    def handle_victory_defeat(self, button):
+        if button is widgets.next_match_button:
+            self.play_next()
+        elif button is widgets.menu_button:
             self.state = MENU
             self.reset_match()
     
+    def play_next(self):
+        # On to the next round, or a new match once this one is decided
+        self.state = PLAYING
+        if self.match.finished:
+            self.reset_match()
+        else:
+            self.reset_round()
+    
     def make_choice(self, choice):
         self.player_choice = choice
-        self.computer_choice = random.choice(["rock", "paper", "scissors"])
+        self.computer_choice = self.strategy.choose()
         self.choice_made = True
         self.computer_revealed = False
-        self.computer_reveal_timer = pygame.time.get_ticks()
-    
-    def update(self):
-        # Update all buttons
-        self.play_button.update()
-        self.quit_button.update()
-        self.rock_button.update()
-        self.paper_button.update()
-        self.scissors_button.update()
-        self.play_again_button.update()
-        self.menu_button.update()
-        self.next_match_button.update()
-        
-        # Handle computer choice reveal animation
+        self.computer_reveal_timer = self.time_ms
+        self.dirty.mark_all()
+    
+    def idle_delay(self):
+        # How long the loop may sleep: 0 while something animates, otherwise
+        # the milliseconds until the next timer, or None if there is none
+        if any(button.is_animating() for button in self.visible_buttons()):
+            return 0
+        if self.state == RESULT and self.player_choice_anim < 20:
+            return 0
+        if self.state in (VICTORY, DEFEAT) and self.popup_alpha < 180:
+            return 0
         if self.choice_made and not self.computer_revealed:
-            if pygame.time.get_ticks() - self.computer_reveal_timer > 1000:
+            elapsed = self.time_ms - self.computer_reveal_timer
+            return max(1, REVEAL_DELAY_MS - elapsed + 1)
+        return None
+    
+    @profiler.profiled()
+    def update(self, dt=1 / FPS):
+        self.check_reveal()
+        self.animate(dt)
+    
+    def check_reveal(self):
+        # Handle computer choice reveal, the only game logic driven by time
+        if self.choice_made and not self.computer_revealed:
+            if self.time_ms - self.computer_reveal_timer > REVEAL_DELAY_MS:
+                if self.recorder:
+                    self.recorder.tick(self.time_ms)
                 self.computer_revealed = True
                 self.calculate_result()
+    
+    def animate(self, dt):
+        # Update visible buttons, hidden ones have nothing to animate on screen
+        for button in self.visible_buttons():
+            button.update(dt)
         
         # Animation updates
+        previous_anim = (self.player_choice_anim, self.computer_choice_anim)
         if self.state == RESULT:
-            self.player_choice_anim = min(self.player_choice_anim + 2, 20)
-            self.computer_choice_anim = min(self.computer_choice_anim + 2, 20)
+            self.player_choice_anim = min(self.player_choice_anim + CHOICE_RISE_SPEED * dt, 20)
+            self.computer_choice_anim = min(self.computer_choice_anim + CHOICE_RISE_SPEED * dt, 20)
         else:
             self.player_choice_anim = 0
             self.computer_choice_anim = 0
+        if (self.player_choice_anim, self.computer_choice_anim) != previous_anim:
+            self.dirty.mark(self.view.rect(CHOICE_AREA))
         
         # Popup animation
+        previous_alpha = self.popup_alpha
         if self.state in (VICTORY, DEFEAT):
-            self.popup_alpha = min(self.popup_alpha + 5, 180)
+            self.popup_alpha = min(self.popup_alpha + POPUP_FADE_SPEED * dt, 180)
         else:
             self.popup_alpha = 0
+        if self.popup_alpha != previous_alpha:
+            self.dirty.mark_all()
     
     def calculate_result(self):
-        if self.player_choice == self.computer_choice:
-            self.result = "It's a tie!"
-            self.scores["draws"] += 1
-            if audio_enabled:
-                tie_sound.play()
-            self.state = RESULT
-        elif ((self.player_choice == "rock" and self.computer_choice == "scissors") or
-              (self.player_choice == "paper" and self.computer_choice == "rock") or
-              (self.player_choice == "scissors" and self.computer_choice == "paper")):
-            self.scores["player"] += 1
-            if self.scores["player"] >= 5:
-                self.result = "You won the match!"
-                self.state = VICTORY
-                if audio_enabled and not self.victory_sound_played:
-                    victory_sound.play()
-                    self.victory_sound_played = True
-            else:
-                self.result = "You win this round!"
-                if audio_enabled:
-                    win_sound.play()
-                self.state = RESULT
-        else:
-            self.scores["computer"] += 1
-            if self.scores["computer"] >= 5:
-                self.result = "Computer won the match!"
-                self.state = DEFEAT
-                if audio_enabled and not self.defeat_sound_played:
-                    defeat_sound.play()
-                    self.defeat_sound_played = True
-            else:
-                self.result = "Computer wins this round!"
-                if audio_enabled:
-                    lose_sound.play()
-                self.state = RESULT
+        outcome = self.outcome = self.match.play_round(self.player_choice, self.computer_choice)
+        self.strategy.observe(self.player_choice, self.computer_choice)
+        if self.history:
+            self.history.append(self.player_choice, self.computer_choice, outcome)
+        if self.recorder:
+            self.recorder.round(self.player_choice, self.computer_choice, outcome, self.scores)
+        _, self.state, sound = ROUND_RESULTS[outcome][self.match.finished]
+        self.sounds(sound)
     
     def reset_round(self):
         self.player_choice = None
         self.computer_choice = None
-        self.result = None
+        self.outcome = None
         self.choice_made = False
         self.computer_revealed = False
         self.player_choice_anim = 0
         self.computer_choice_anim = 0
     
+    @profiler.profiled()
     def draw_scoreboard(self):
-        # Draw scoreboard background
-        scoreboard_rect = pygame.Rect(20, 20, 760, 80)
-        pygame.draw.rect(screen, (30, 30, 60), scoreboard_rect, border_radius=15)
-        pygame.draw.rect(screen, PURPLE, scoreboard_rect, 3, border_radius=15)
-        
-        # Draw scoreboard title
-        font = pygame.font.Font(None, 32)
-        title = font.render("SCOREBOARD (First to 5 wins)", True, GOLD)
-        screen.blit(title, (WINDOW_WIDTH//2 - title.get_width()//2, 30))
+        # Panel and title are static, only the scores change
+        batch.add(*layers.get("scoreboard", build_scoreboard_layer, self.view.size))
         
         # Draw scores
-        font = pygame.font.Font(None, 36)
-        player_text = font.render(f"YOU: {self.scores['player']}", True, GREEN)
-        computer_text = font.render(f"COMPUTER: {self.scores['computer']}", True, RED)
-        draws_text = font.render(f"DRAWS: {self.scores['draws']}", True, WHITE)
+        view = self.view
+        player_text = text_cache.render(f"YOU: {self.match.player}", view.font(36), GREEN)
+        computer_text = text_cache.render(f"COMPUTER: {self.match.computer}", view.font(36), RED)
+        draws_text = text_cache.render(f"DRAWS: {self.match.draws}", view.font(36), WHITE)
         
-        screen.blit(player_text, (100, 60))
-        screen.blit(computer_text, (WINDOW_WIDTH//2 - computer_text.get_width()//2, 60))
-        screen.blit(draws_text, (WINDOW_WIDTH - 180, 60))
+        batch.add(player_text, view.point(100, 60))
+        batch.add(computer_text, view.centered(computer_text, 60))
+        batch.add(draws_text, view.point(WINDOW_WIDTH - 180, 60))
     
+    @profiler.profiled()
     def draw_choices(self):
-        if self.player_choice:
-            y_offset = -self.player_choice_anim
-            if self.player_choice == "rock":
-                screen.blit(rock_img, (120, 300 + y_offset))
-                font = pygame.font.Font(None, 36)
-                label = font.render("YOUR CHOICE", True, GREEN)
-                screen.blit(label, (120 + 60 - label.get_width()//2, 270 + y_offset))
-            elif self.player_choice == "paper":
-                screen.blit(paper_img, (340, 300 + y_offset))
-                font = pygame.font.Font(None, 36)
-                label = font.render("YOUR CHOICE", True, GREEN)
-                screen.blit(label, (340 + 60 - label.get_width()//2, 270 + y_offset))
-            elif self.player_choice == "scissors":
-                screen.blit(scissors_img, (560, 300 + y_offset))
-                font = pygame.font.Font(None, 36)
-                label = font.render("YOUR CHOICE", True, GREEN)
-                screen.blit(label, (560 + 60 - label.get_width()//2, 270 + y_offset))
-        
-        if self.computer_choice and self.computer_revealed:
-            y_offset = -self.computer_choice_anim
-            if self.computer_choice == "rock":
-                screen.blit(rock_img, (120, 300 + y_offset))
-                font = pygame.font.Font(None, 36)
-                label = font.render("COMPUTER'S CHOICE", True, RED)
-                screen.blit(label, (120 + 60 - label.get_width()//2, 270 + y_offset))
-            elif self.computer_choice == "paper":
-                screen.blit(paper_img, (340, 300 + y_offset))
-                font = pygame.font.Font(None, 36)
-                label = font.render("COMPUTER'S CHOICE", True, RED)
-                screen.blit(label, (340 + 60 - label.get_width()//2, 270 + y_offset))
-            elif self.computer_choice == "scissors":
-                screen.blit(scissors_img, (560, 300 + y_offset))
-                font = pygame.font.Font(None, 36)
-                label = font.render("COMPUTER'S CHOICE", True, RED)
-                screen.blit(label, (560 + 60 - label.get_width()//2, 270 + y_offset))
+        layout = widgets.choice_layout(self.variant)
+        if self.player_choice is not None:
+            self.draw_choice(layout, self.player_choice, 0, self.player_choice_anim, "YOUR CHOICE", GREEN)
+        if self.computer_choice is not None and self.computer_revealed:
+            self.draw_choice(layout, self.computer_choice, 1, self.computer_choice_anim, "COMPUTER'S CHOICE", RED)
     
+    def draw_choice(self, layout, move, side, anim, text, color):
+        x = layout.reveal_x[move][side]
+        y_offset = -anim
+        view = self.view
+        batch.add_sprite(sprite(move_image(self.variant, move, view.extent(HAND_SIZE))), view.point(x, 300 + y_offset))
+        label = text_cache.render(text, view.font(36), color)
+        batch.add(label, view.centered(label, 270 + y_offset, x + HAND_SIZE[0] // 2))
+    
+    @profiler.profiled()
     def draw_menu(self):
-        # Draw title
-        font = pygame.font.Font(None, 72)
-        title = font.render("BEAT THE HAND", True, GOLD)
-        subtitle = font.render("Rock Paper Scissors", True, ORANGE)
-        
-        title_rect = title.get_rect(center=(WINDOW_WIDTH//2, 140))
-        subtitle_rect = subtitle.get_rect(center=(WINDOW_WIDTH//2, 200))
-        
-        screen.blit(title, title_rect)
-        screen.blit(subtitle, subtitle_rect)
-        
-        # Draw game info
-        font = pygame.font.Font(None, 28)
-        lines = [
-            "A strategic battle of hands!",
-            "Challenge the computer in the classic game",
-            "of Rock-Paper-Scissors with a modern twist.",
-            "",
-            "Rules:",
-            "- Rock crushes Scissors",
-            "- Paper covers Rock",
-            "- Scissors cut Paper",
-            "",
-            "First to 5 wins becomes the ultimate champion!"
-        ]
-        
-        for i, line in enumerate(lines):
-            text = font.render(line, True, WHITE)
-            screen.blit(text, (WINDOW_WIDTH//2 - text.get_width()//2, 240 + i*25))
+        batch.add(*layers.get("menu", build_menu_layer, self.view.size, self.variant))
         
         # Draw buttons
-        self.play_button.draw(screen)
-        self.quit_button.draw(screen)
+        widgets.play_button.draw(batch)
+        widgets.quit_button.draw(batch)
     
+    @profiler.profiled()
     def draw_playing(self):
-        font = pygame.font.Font(None, 48)
-        text = font.render("Choose your weapon:", True, WHITE)
-        text_rect = text.get_rect(center=(WINDOW_WIDTH//2, 200))
-        screen.blit(text, text_rect)
+        text = text_cache.render("Choose your weapon:", self.view.font(48), WHITE)
+        text_rect = text.get_rect(center=self.view.point(WINDOW_WIDTH//2, 200))
+        batch.add(text, text_rect)
         
         if not self.choice_made:
-            self.rock_button.draw(screen)
-            self.paper_button.draw(screen)
-            self.scissors_button.draw(screen)
-            
-            # Draw labels
-            font = pygame.font.Font(None, 36)
-            rock_text = font.render("ROCK", True, WHITE)
-            paper_text = font.render("PAPER", True, WHITE)
-            scissors_text = font.render("SCISSORS", True, WHITE)
-            
-            screen.blit(rock_text, (120 + 60 - rock_text.get_width()//2, 530))
-            screen.blit(paper_text, (340 + 60 - paper_text.get_width()//2, 530))
-            screen.blit(scissors_text, (560 + 60 - scissors_text.get_width()//2, 530))
+            widgets.choice_layout(self.variant).draw(batch)
         else:
             if not self.computer_revealed:
-                font = pygame.font.Font(None, 36)
-                thinking_text = font.render("Computer is choosing...", True, WHITE)
-                screen.blit(thinking_text, (WINDOW_WIDTH//2 - thinking_text.get_width()//2, 230))
+                thinking_text = text_cache.render("Computer is choosing...", self.view.font(36), WHITE)
+                batch.add(thinking_text, self.view.centered(thinking_text, 230))
             
             self.draw_choices()
     
+    @profiler.profiled()
     def draw_result(self):
         self.draw_choices()
         
-        font = pygame.font.Font(None, 48)
-        result_text = font.render(self.result, True, GOLD if "win" in self.result else WHITE)
-        screen.blit(result_text, (WINDOW_WIDTH//2 - result_text.get_width()//2, 200))
+        result_text = text_cache.render(self.result, self.view.font(48), WHITE if self.outcome == engine.TIE else GOLD)
+        batch.add(result_text, self.view.centered(result_text, 200))
         
-        self.play_again_button.draw(screen)
-        self.menu_button.draw(screen)
+        widgets.play_again_button.draw(batch)
+        widgets.menu_button.draw(batch)
+    
+    def draw_overlay(self):
+        overlay = layers.get("overlay", build_overlay_layer, self.view.size)
+        overlay.set_alpha(int(self.popup_alpha))
+        batch.add(overlay, (0, 0))
     
+    @profiler.profiled()
     def draw_victory(self):
-        # Draw dark overlay
-        s = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        s.fill((0, 0, 0, self.popup_alpha))
-        screen.blit(s, (0, 0))
-        
-        # Draw popup
-        popup_rect = pygame.Rect(100, 150, 600, 300)
-        pygame.draw.rect(screen, (40, 80, 40), popup_rect, border_radius=20)
-        pygame.draw.rect(screen, GOLD, popup_rect, 4, border_radius=20)
+        self.draw_overlay()
+        batch.add(*layers.get("victory", build_popup_layer, self.view.size, (40, 80, 40), GOLD,
+                                "ULTIMATE CHAMPION!", "First to 5 wins takes the match!", True))
         
-        # Draw stars decoration
-        star_img = pygame.Surface((20, 20), pygame.SRCALPHA)
-        pygame.draw.polygon(star_img, GOLD, [(10, 0), (12, 7), (20, 7), (14, 12), (16, 20), 
-                                            (10, 15), (4, 20), (6, 12), (0, 7), (8, 7)])
+        subtitle = text_cache.render(f"You won :  {self.match.player}-{self.match.computer}", self.view.font(48), WHITE)
+        batch.add(subtitle, self.view.centered(subtitle, 260))
         
-        for i in range(8):
-            angle = i * 45
-            pos_x = WINDOW_WIDTH//2 + 250 * pygame.math.Vector2(1, 0).rotate(angle).x
-            pos_y = WINDOW_HEIGHT//2 + 150 * pygame.math.Vector2(1, 0).rotate(angle).y
-            screen.blit(star_img, (pos_x - 10, pos_y - 10))
-        
-        # Draw text
-        font = pygame.font.Font(None, 72)
-        title = font.render("ULTIMATE CHAMPION!", True, GOLD)
-        screen.blit(title, (WINDOW_WIDTH//2 - title.get_width()//2, 180))
-        
-        font = pygame.font.Font(None, 48)
-        subtitle = font.render(f"You won :  {self.scores['player']}-{self.scores['computer']}", True, WHITE)
-        screen.blit(subtitle, (WINDOW_WIDTH//2 - subtitle.get_width()//2, 260))
-        
-        font = pygame.font.Font(None, 28)
-        instruction = font.render("First to 5 wins takes the match!", True, WHITE)
-        screen.blit(instruction, (WINDOW_WIDTH//2 - instruction.get_width()//2, 330))
-        
-        self.next_match_button.draw(screen)
-        self.menu_button.draw(screen)
+        widgets.next_match_button.draw(batch)
+        widgets.menu_button.draw(batch)
     
+    @profiler.profiled()
     def draw_defeat(self):
-        # Draw dark overlay
-        s = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        s.fill((0, 0, 0, self.popup_alpha))
-        screen.blit(s, (0, 0))
-        
-        # Draw popup
-        popup_rect = pygame.Rect(100, 150, 600, 300)
-        pygame.draw.rect(screen, (80, 40, 40), popup_rect, border_radius=20)
-        pygame.draw.rect(screen, RED, popup_rect, 4, border_radius=20)
-        
-        # Draw text
-        font = pygame.font.Font(None, 72)
-        title = font.render("MATCH LOST", True, RED)
-        screen.blit(title, (WINDOW_WIDTH//2 - title.get_width()//2, 180))
+        self.draw_overlay()
+        batch.add(*layers.get("defeat", build_popup_layer, self.view.size, (80, 40, 40), RED,
+                                "MATCH LOST", "Better luck next time!", False))
         
-        font = pygame.font.Font(None, 48)
-        subtitle = font.render(f"Computer won :  {self.scores['computer']}-{self.scores['player']}", True, WHITE)
-        screen.blit(subtitle, (WINDOW_WIDTH//2 - subtitle.get_width()//2, 260))
+        subtitle = text_cache.render(f"Computer won :  {self.match.computer}-{self.match.player}", self.view.font(48), WHITE)
+        batch.add(subtitle, self.view.centered(subtitle, 260))
         
-        font = pygame.font.Font(None, 28)
-        instruction = font.render("Better luck next time!", True, WHITE)
-        screen.blit(instruction, (WINDOW_WIDTH//2 - instruction.get_width()//2, 330))
-        
-        self.next_match_button.draw(screen)
-        self.menu_button.draw(screen)
+        widgets.next_match_button.draw(batch)
+        widgets.menu_button.draw(batch)
     
-    def draw(self):
-        # Draw background
-        screen.blit(bg_img, (0, 0))
+    @profiler.profiled()
+    def draw(self, surface=None):
+        # Draw background, stretched over the whole window
+        batch.add(assets.scaled("background.png", self.view.size), (0, 0))
         
         # Always draw scoreboard
         self.draw_scoreboard()
@@ -518,29 +1417,145 @@ class Game:
         elif self.state == DEFEAT:
             self.draw_playing()  # Show last move behind popup
             self.draw_defeat()
+        
+        with profiler.section("blits"):
+            batch.flush(screen if surface is None else surface)
 
 def main():
-    game = Game()
+    parser = argparse.ArgumentParser(description="Beat the Hand: Rock Paper Scissors")
+    parser.add_argument("--strategy", default="random", choices=list(strategies.STRATEGIES),
+                        help="how the computer picks its move")
+    parser.add_argument("--variant", default="classic",
+                        help=f"rule set, one of {', '.join(engine.variant_names())} or a definition file")
+    parser.add_argument("--history", default=history.DEFAULT_PATH,
+                        help="file every round is appended to")
+    parser.add_argument("--no-history", action="store_true", help="do not record rounds")
+    parser.add_argument("--trace", help="write a Chrome trace of the last frames here on exit")
+    parser.add_argument("--seed", type=int, help="seed for the computer's moves, random if not given")
+    parser.add_argument("--record", help="save the session here on exit for replay.py")
+    parser.add_argument("--size", type=parse_size, help="initial window size as WIDTHxHEIGHT")
+    parser.add_argument("--fullscreen", action="store_true", help="start in fullscreen, F11 toggles it")
+    capture.add_arguments(parser)
+    args = parser.parse_args()
+    seed = args.seed if args.seed is not None else int.from_bytes(os.urandom(4), "little")
+    try:
+        variant = engine.load_variant(args.variant)
+    except (ValueError, KeyError) as e:
+        parser.error(f"bad variant: {e}")
+    pygame.display.set_caption(f"Beat the Hand: {variant.title}")
+    
+    if args.trace:
+        atexit.register(profiler.export_chrome_trace, args.trace)
+    
+    history_log = None
+    if variant is not engine.CLASSIC:
+        # The history format and its stats only know the three classic moves
+        print("Match history is only kept for the classic rules")
+    elif not args.no_history:
+        try:
+            history_log = history.HistoryLog(args.history)
+        except (OSError, ValueError) as e:
+            print(f"Match history disabled: {e}")
+    
+    if args.fullscreen:
+        pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    elif args.size:
+        pygame.display.set_mode(args.size, pygame.RESIZABLE)
+    resize()
+    
+    try:
+        frame_capture = capture.from_args(args, screen, FPS)
+    except (OSError, ValueError) as e:
+        parser.error(f"cannot capture: {e}")
+    if frame_capture:
+        atexit.register(frame_capture.close)
     
+    recorder = Recorder(args.strategy, seed, variant, screen.get_size()) if args.record else None
+    game = Game(strategies.create(args.strategy, seed, variant), history_log, recorder, variant)
+    if recorder:
+        atexit.register(recorder.save, args.record, game)
+    
+    # Only the background is needed for the menu, everything else loads behind it
+    # Hands at the default window size are worth caching on disk, other sizes are not
+    hand_size = view.extent(HAND_SIZE)
+    assets.preload([(image, hand_size) for image in variant.images if image and assets.exists(image)],
+                   persist=hand_size == HAND_SIZE)
+    audio.preload()
+    
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(ALLOWED_EVENTS)
+    
+    pending = []
+    dt = 1 / FPS
+    show_profiler = False
+    clock.tick()
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+        profiler.begin_frame()
+        game.time_ms = pygame.time.get_ticks()
+        with profiler.section("events"):
+            events = pending + pygame.event.get()
+            pending = []
+            for event in coalesce_events(events):
+                if event.type == pygame.QUIT:
+                    pygame.quit()
+                    sys.exit()
+                elif event.type in (pygame.WINDOWEXPOSED, ASSETS_READY):
+                    dirty.mark_all()
+                elif event.type == pygame.VIDEORESIZE:
+                    # A drag sends a run of these, only the first sees a new size
+                    if resize() and recorder:
+                        recorder.resize(game.time_ms, screen.get_size())
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == FULLSCREEN_KEY:
+                        if toggle_fullscreen() and recorder:
+                            recorder.resize(game.time_ms, screen.get_size())
+                    elif event.key == OVERLAY_KEY:
+                        show_profiler = not show_profiler
+                        dirty.mark(PROFILER_RECT)
+                    elif event.key == TRACE_KEY:
+                        path = profiler.export_chrome_trace(f"rps-trace-{int(time.time())}.json")
+                        print(f"Trace written to {path}")
+                else:
+                    game.handle_event(event)
+            if game.quit_requested:
                 pygame.quit()
                 sys.exit()
-            
-            if game.state == MENU:
-                game.handle_menu(event)
-            elif game.state == PLAYING:
-                game.handle_playing(event)
-            elif game.state == RESULT:
-                game.handle_result(event)
-            elif game.state in (VICTORY, DEFEAT):
-                game.handle_victory_defeat(event)
-        
-        game.update()
-        game.draw()
-        pygame.display.flip()
-        clock.tick(FPS)
+        
+        game.update(dt)
+        if not DIRTY_RENDERING:
+            game.draw()
+            if show_profiler:
+                draw_profiler_overlay(screen)
+            with profiler.section("present"):
+                pygame.display.flip()
+        elif dirty:
+            # Redraw only inside the changed regions and push just those
+            rects = dirty.flush()
+            screen.set_clip(rects[0].unionall(rects[1:]))
+            game.draw()
+            if show_profiler:
+                draw_profiler_overlay(screen)
+            screen.set_clip(None)
+            with profiler.section("present"):
+                pygame.display.update(rects)
+        if frame_capture:
+            # Every frame, changed or not, so the video keeps a steady rate
+            with profiler.section("capture"):
+                frame_capture.frame(screen)
+        profiler.end_frame()
+        
+        delay = game.idle_delay()
+        if delay == 0 or frame_capture:
+            dt = min(clock.tick(FPS) / 1000, MAX_FRAME_TIME)
+        else:
+            # Nothing is moving, sleep until input arrives or the next timer is due
+            timeout = 1000 // IDLE_FPS if delay is None else min(delay, 1000 // IDLE_FPS)
+            event = pygame.event.wait(timeout)
+            if event.type != pygame.NOEVENT:
+                pending.append(event)
+            # Time spent asleep is not animation time
+            clock.tick()
+            dt = 1 / FPS
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
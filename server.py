@@ -0,0 +1,301 @@
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+import engine
+import strategies
+
+# Match server for many concurrent games over TCP, using the same rules and
+# first-to-5 flow as the desktop game (engine.Match). The protocol is one
+# text command per line:
+#
+#   client -> server    PLAY BOT [strategy] | PLAY PVP | MOVE <rock|paper|scissors> | QUIT
+#   server -> client    WAIT | MATCH <id> <opponent> | ROUND <you> <them> <win|lose|tie> <you> <them> <draws>
+#                       OVER <win|lose|forfeit> | ERROR <message>
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 5005
+
+OUTCOME_WORDS = {engine.TIE: "tie", engine.PLAYER_WIN: "win", engine.COMPUTER_WIN: "lose"}
+
+# The same round seen from the other side of the table
+FLIPPED = {engine.TIE: engine.TIE, engine.PLAYER_WIN: engine.COMPUTER_WIN,
+           engine.COMPUTER_WIN: engine.PLAYER_WIN}
+
+
+class Session:
+    # Per-connection state, kept small since a node hosts thousands of these
+    __slots__ = ("writer", "out", "match", "side", "opponent", "bot", "move")
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.out = []
+        self.match = None
+        self.side = None  # "player" or "computer", the side of engine.Match this session plays
+        self.opponent = None
+        self.bot = None
+        self.move = None
+
+
+class MatchServer:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.sessions = set()
+        self.waiting = None
+        self.pending = set()
+        self.flush_scheduled = False
+        self.next_match_id = 1
+        self.rounds = 0
+        self.matches = 0
+
+    # Output is queued per session and written once per event loop pass, so
+    # every line produced while handling a batch of input costs one write().
+    def send(self, session, line):
+        session.out.append(line)
+        self.pending.add(session)
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        self.flush_scheduled = False
+        for session in self.pending:
+            if not session.writer.is_closing():
+                session.writer.write(("\n".join(session.out) + "\n").encode())
+            session.out.clear()
+        self.pending.clear()
+
+    async def handle(self, reader, writer):
+        session = Session(writer)
+        self.sessions.add(session)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").split()
+                if command == ["QUIT"]:
+                    break
+                self.dispatch(session, command)
+                # Let the peer drain before reading more if it is slow
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.leave(session)
+            writer.close()
+
+    def dispatch(self, session, command):
+        if len(command) >= 2 and command[0] == "PLAY":
+            if session.match is not None:
+                self.send(session, "ERROR already in a match")
+            elif command[1] == "BOT":
+                name = command[2] if len(command) > 2 else "random"
+                try:
+                    bot = strategies.create(name, self.rng.random())
+                except ValueError as e:
+                    self.send(session, f"ERROR {e}")
+                    return
+                self.start(session, None, f"bot:{name}", bot)
+            elif command[1] == "PVP":
+                if self.waiting is not None and self.waiting is not session:
+                    opponent, self.waiting = self.waiting, None
+                    self.start(opponent, session, "player")
+                else:
+                    self.waiting = session
+                    self.send(session, "WAIT")
+            else:
+                self.send(session, "ERROR unknown opponent")
+        elif len(command) == 2 and command[0] == "MOVE":
+            if command[1] not in engine.MOVE_INDEX:
+                self.send(session, "ERROR unknown move")
+            elif session.match is None:
+                self.send(session, "ERROR not in a match")
+            else:
+                self.move(session, engine.MOVE_INDEX[command[1]])
+        else:
+            self.send(session, "ERROR unknown command")
+
+    def start(self, session, opponent, opponent_name, bot=None):
+        # A session queued for PvP leaves the queue once it starts any match
+        if self.waiting is session or self.waiting is opponent:
+            self.waiting = None
+        match = engine.Match()
+        match_id = self.next_match_id
+        self.next_match_id += 1
+        session.match, session.side, session.move, session.bot = match, "player", None, bot
+        self.send(session, f"MATCH {match_id} {opponent_name}")
+        if opponent is not None:
+            opponent.match, opponent.side, opponent.move, opponent.bot = match, "computer", None, None
+            session.opponent, opponent.opponent = opponent, session
+            self.send(opponent, f"MATCH {match_id} player")
+
+    def move(self, session, move):
+        if session.bot is not None:
+            computer_move = session.bot.choose()
+            outcome = session.match.play_round(move, computer_move)
+            session.bot.observe(move, computer_move)
+            self.report(session, move, computer_move, outcome)
+            return
+
+        session.move = move
+        opponent = session.opponent
+        if opponent is None or opponent.move is None:
+            return
+        player, computer = (session, opponent) if session.side == "player" else (opponent, session)
+        player_move, computer_move = player.move, computer.move
+        player.move = computer.move = None
+        outcome = session.match.play_round(player_move, computer_move)
+        self.report(player, player_move, computer_move, outcome)
+        self.report(computer, computer_move, player_move, FLIPPED[outcome])
+
+    def report(self, session, own_move, other_move, outcome):
+        # Scores and outcome from this session's point of view
+        scores = session.match.scores
+        own, other = (("player", "computer") if session.side == "player" else ("computer", "player"))
+        self.send(session, f"ROUND {engine.MOVES[own_move]} {engine.MOVES[other_move]} "
+                           f"{OUTCOME_WORDS[outcome]} {scores[own]} {scores[other]} {scores['draws']}")
+        if session.side == "player":
+            self.rounds += 1
+        if session.match.finished:
+            self.send(session, "OVER " + ("win" if session.match.winner == session.side else "lose"))
+            if session.side == "player":
+                self.matches += 1
+            self.end(session)
+
+    def end(self, session):
+        session.match = session.side = session.opponent = session.bot = session.move = None
+
+    def leave(self, session):
+        self.sessions.discard(session)
+        self.pending.discard(session)
+        if self.waiting is session:
+            self.waiting = None
+        opponent = session.opponent
+        if opponent is not None:
+            # Counted here whichever side left, end() stops the other side counting it again
+            self.send(opponent, "OVER forfeit")
+            self.end(opponent)
+            self.matches += 1
+
+    async def report_stats(self, interval):
+        # The rounds per CPU-second figure is what bounds sessions per core
+        last_rounds, last_cpu, last_wall = self.rounds, time.process_time(), time.perf_counter()
+        while True:
+            await asyncio.sleep(interval)
+            rounds, cpu, wall = self.rounds, time.process_time(), time.perf_counter()
+            busy = (cpu - last_cpu) / (wall - last_wall)
+            rate = (rounds - last_rounds) / (wall - last_wall)
+            per_cpu_second = (rounds - last_rounds) / (cpu - last_cpu) if cpu > last_cpu else 0
+            print(f"sessions {len(self.sessions)}  matches {self.matches}  rounds/s {rate:,.0f}  "
+                  f"cpu {busy:.0%}  rounds per cpu-second {per_cpu_second:,.0f}", flush=True)
+            last_rounds, last_cpu, last_wall = rounds, cpu, wall
+
+
+async def serve(host, port, stats_interval, seed=None):
+    server = MatchServer(seed)
+    tcp = await asyncio.start_server(server.handle, host, port, backlog=4096)
+    print(f"Match server listening on {host}:{port}", flush=True)
+    if stats_interval:
+        asyncio.get_running_loop().create_task(server.report_stats(stats_interval))
+    async with tcp:
+        await tcp.serve_forever()
+
+
+# Load generator
+
+async def simulated_player(host, port, deadline, pvp, rng, results):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        results["failed"] += 1
+        return
+    results["connected"] += 1
+    try:
+        while time.perf_counter() < deadline:
+            writer.write(b"PLAY PVP\n" if pvp else b"PLAY BOT random\n")
+            line = await reader.readline()
+            # Both sides of a PvP match see every round, only the side that
+            # queued first counts them so the totals match the server's
+            counted = not pvp or line.startswith(b"WAIT")
+            if line.startswith(b"WAIT"):
+                # Give up waiting for an opponent once the run is over
+                try:
+                    line = await asyncio.wait_for(reader.readline(), max(0.1, deadline - time.perf_counter()))
+                except asyncio.TimeoutError:
+                    break
+            if not line.startswith(b"MATCH"):
+                break
+
+            while True:
+                start = time.perf_counter()
+                writer.write(f"MOVE {rng.choice(engine.MOVES)}\n".encode())
+                line = await reader.readline()
+                if line.startswith(b"ROUND"):
+                    results["latencies"].append(time.perf_counter() - start)
+                    results["rounds"] += counted
+                    parts = line.split()
+                    if max(int(parts[4]), int(parts[5])) < engine.WINS_NEEDED:
+                        continue
+                    line = await reader.readline()
+                break
+            if not line.startswith(b"OVER"):
+                break
+            results["matches"] += counted
+    except ConnectionError:
+        results["failed"] += 1
+    finally:
+        writer.close()
+
+
+async def load(host, port, players, duration, pvp_share, seed):
+    rng = random.Random(seed)
+    results = {"connected": 0, "failed": 0, "rounds": 0, "matches": 0, "latencies": []}
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        simulated_player(host, port, deadline, i < players * pvp_share, random.Random(rng.random()), results)
+        for i in range(players)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(results.pop("latencies"))
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0
+    print(f"players {players}  connected {results['connected']}  failed {results['failed']}")
+    print(f"rounds {results['rounds']:,} ({results['rounds'] / elapsed:,.0f}/s)  matches {results['matches']:,}")
+    print(f"round trip p50 {percentile(0.5):.2f} ms  p99 {percentile(0.99):.2f} ms")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Rock Paper Scissors match server and load generator")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the match server")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST)
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument("--stats", type=float, default=5.0, help="seconds between stats lines, 0 to disable")
+    serve_parser.add_argument("--seed", type=int, default=None)
+
+    load_parser = commands.add_parser("load", help="simulate many players against a running server")
+    load_parser.add_argument("--host", default=DEFAULT_HOST)
+    load_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    load_parser.add_argument("--players", type=int, default=10000)
+    load_parser.add_argument("--duration", type=float, default=10.0, help="seconds to keep playing")
+    load_parser.add_argument("--pvp", type=float, default=0.5, help="share of players queueing for each other")
+    load_parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "serve":
+            asyncio.run(serve(args.host, args.port, args.stats, args.seed))
+        else:
+            asyncio.run(load(args.host, args.port, args.players, args.duration, args.pvp, args.seed))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,210 @@
+import sys
+import random
+import argparse
+
+import pygame
+import rps
+import engine
+import strategies
+
+# Spectator view for lobby screens: a grid of live bot-vs-bot matches, each in
+# its own tile. Every match is an rps.Game with its own View and DirtyRegions
+# sized to its tile, so it draws into a subsurface of the window and says when
+# it changed; only changed tiles are redrawn and pushed. The matches advance
+# in fixed simulation ticks, decoupled from the frame rate, so the logic cost
+# grows with the number of boards while drawing stays bounded by what changed.
+
+MAX_BOARDS = 64
+TICK_MS = 50  # Simulation step
+MAX_TICKS_PER_FRAME = 10  # Past this a slow frame drops simulation time instead of catching up
+THINK_MS = (300, 900)  # How long the player's bot takes to pick a move
+RESULT_PAUSE_MS = 1200
+MATCH_PAUSE_MS = 3000
+TILE_GAP = 4
+BACKDROP = (5, 5, 15)
+
+
+def silent(name):
+    # Dozens of boards would play over each other, the lobby stays quiet
+    pass
+
+
+class Board:
+    # One match between two strategies, shown in one tile. The game's own
+    # strategy plays the computer, self.player plays the other side.
+    __slots__ = ("game", "player", "caption", "rng", "next_action", "rect", "surface")
+
+    def __init__(self, player_name, computer_name, seed, variant):
+        self.rng = random.Random(seed)
+        self.player = strategies.create(player_name, self.rng.random(), variant)
+        computer = strategies.create(computer_name, self.rng.random(), variant)
+        size = (rps.WINDOW_WIDTH, rps.WINDOW_HEIGHT)
+        self.game = rps.Game(computer, variant=variant, view=rps.View(size), dirty=rps.DirtyRegions((0, 0) + size),
+                             sounds=silent)
+        self.caption = f"{player_name} vs {computer_name}"
+        # Boards start at different times so they do not move in step
+        self.next_action = self.rng.randrange(2000)
+        self.rect = self.surface = None
+
+    def place(self, window, rect):
+        self.rect = rect
+        self.surface = window.subsurface(rect)
+        self.game.view.resize(rect.size)
+        self.game.dirty.bounds = pygame.Rect((0, 0), rect.size)
+        self.game.dirty.mark_all()
+
+    def tick(self, now):
+        game = self.game
+        game.time_ms = now
+        if game.state == rps.PLAYING:
+            if not game.choice_made:
+                if now >= self.next_action:
+                    game.make_choice(self.player.choose())
+            elif not game.computer_revealed:
+                game.check_reveal()
+                if game.computer_revealed:
+                    # The player's bot sees the round from its own side
+                    self.player.observe(game.computer_choice, game.player_choice)
+                    self.next_action = now + (MATCH_PAUSE_MS if game.match.finished else RESULT_PAUSE_MS)
+        elif now >= self.next_action:
+            # Still on the menu, or the result has been shown long enough
+            game.play_next()
+            self.next_action = now + self.rng.randint(*THINK_MS)
+        game.animate(TICK_MS / 1000)
+
+    def draw(self):
+        game = self.game
+        view = game.view
+        rps.batch.add(rps.assets.scaled("background.png", view.size), (0, 0))
+        game.draw_scoreboard()
+        game.draw_choices()
+        if game.result:
+            text = rps.text_cache.render(game.result, view.font(48), rps.WHITE if game.outcome == engine.TIE
+                                         else rps.GOLD)
+            rps.batch.add(text, view.centered(text, 200))
+        caption = rps.text_cache.render(self.caption, view.font(40), rps.ORANGE)
+        rps.batch.add(caption, view.centered(caption, 520))
+        rps.batch.flush(self.surface)
+
+
+def grid(count, size):
+    # Columns and rows that give the largest tiles for the game's aspect ratio
+    width, height = size
+
+    def scale(columns):
+        rows = -(-count // columns)
+        return min(width / columns / rps.WINDOW_WIDTH, height / rows / rps.WINDOW_HEIGHT)
+
+    columns = max(range(1, count + 1), key=scale)
+    return columns, -(-count // columns)
+
+
+class Spectator:
+    def __init__(self, boards):
+        self.boards = boards
+        self.now = 0
+        self.ticks = 0
+        self.layout()
+
+    def layout(self):
+        # Tiles for the current window size, centered with a gap between them
+        window = rps.screen
+        window.fill(BACKDROP)
+        columns, rows = grid(len(self.boards), window.get_size())
+        scale = min(window.get_width() / columns / rps.WINDOW_WIDTH, window.get_height() / rows / rps.WINDOW_HEIGHT)
+        cell_width, cell_height = int(rps.WINDOW_WIDTH * scale), int(rps.WINDOW_HEIGHT * scale)
+        left = (window.get_width() - columns * cell_width) // 2
+        top = (window.get_height() - rows * cell_height) // 2
+        for i, board in enumerate(self.boards):
+            column, row = i % columns, i // columns
+            rect = pygame.Rect(left + column * cell_width, top + row * cell_height, cell_width, cell_height)
+            board.place(window, rect.inflate(-TILE_GAP, -TILE_GAP))
+
+    def redraw_all(self):
+        for board in self.boards:
+            board.game.dirty.mark_all()
+
+    def advance(self, elapsed_ms, backlog):
+        # Runs every tick that is due, returns the time not yet simulated
+        backlog += elapsed_ms
+        steps = 0
+        while backlog >= TICK_MS and steps < MAX_TICKS_PER_FRAME:
+            self.now += TICK_MS
+            for board in self.boards:
+                board.tick(self.now)
+            backlog -= TICK_MS
+            steps += 1
+        self.ticks += steps
+        return backlog if steps < MAX_TICKS_PER_FRAME else 0
+
+    def draw(self):
+        # Redraws the tiles whose game changed, returns their window rects
+        rects = []
+        for board in self.boards:
+            if board.game.dirty:
+                board.game.dirty.flush()
+                board.draw()
+                rects.append(board.rect)
+        return rects
+
+
+def create_boards(count, seed, variant, names):
+    rng = random.Random(seed)
+    return [Board(rng.choice(names), rng.choice(names), f"{seed}:{i}", variant) for i in range(count)]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Watch a grid of live bot-vs-bot matches")
+    parser.add_argument("--boards", type=int, default=36, help=f"matches to show, up to {MAX_BOARDS}")
+    parser.add_argument("--strategies", nargs="+", default=list(strategies.STRATEGIES), metavar="NAME",
+                        help="strategies the bots are drawn from")
+    parser.add_argument("--variant", default="classic",
+                        help=f"rule set, one of {', '.join(engine.variant_names())} or a definition file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--size", type=rps.parse_size, default=(1280, 960), help="window size as WIDTHxHEIGHT")
+    parser.add_argument("--fullscreen", action="store_true", help="start in fullscreen, F11 toggles it")
+    args = parser.parse_args(argv)
+    if not 1 <= args.boards <= MAX_BOARDS:
+        parser.error(f"--boards must be between 1 and {MAX_BOARDS}")
+    for name in args.strategies:
+        if name not in strategies.STRATEGIES:
+            parser.error(f"unknown strategy {name!r}, choose from: {', '.join(strategies.STRATEGIES)}")
+    try:
+        variant = engine.load_variant(args.variant)
+    except (ValueError, KeyError) as e:
+        parser.error(f"bad variant: {e}")
+
+    pygame.display.set_caption(f"Beat the Hand: {args.boards} live matches")
+    if args.fullscreen:
+        pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+    else:
+        pygame.display.set_mode(args.size, pygame.RESIZABLE)
+    rps.resize()
+    spectator = Spectator(create_boards(args.boards, args.seed, variant, args.strategies))
+    pygame.display.flip()
+
+    pygame.event.set_blocked(None)
+    pygame.event.set_allowed(rps.ALLOWED_EVENTS)
+    backlog = 0
+    rps.clock.tick()
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return 0
+            elif event.type == pygame.VIDEORESIZE or (event.type == pygame.KEYDOWN
+                                                      and event.key == rps.FULLSCREEN_KEY):
+                resized = rps.toggle_fullscreen() if event.type == pygame.KEYDOWN else rps.resize()
+                if resized:
+                    spectator.layout()
+                    pygame.display.flip()
+            elif event.type in (pygame.WINDOWEXPOSED, rps.ASSETS_READY):
+                spectator.redraw_all()
+
+        backlog = spectator.advance(rps.clock.tick(rps.FPS), backlog)
+        rects = spectator.draw()
+        if rects:
+            pygame.display.update(rects)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,213 @@
+import argparse
+import random
+import time
+import tracemalloc
+from array import array
+
+import engine
+
+# Computer opponents. A strategy picks the computer's next move with choose()
+# and learns from each finished round through observe(). Every strategy keeps
+# fixed-size count tables that are updated in constant time, so the cost of a
+# move does not grow with the length of the session. Strategies play any rule
+# variant, the classic three moves unless told otherwise.
+
+N_MOVES = len(engine.MOVES)
+
+# COUNTER[move] is the move that beats it
+COUNTER = engine.CLASSIC.counter
+
+# Largest Markov count table; higher orders are dropped for big variants
+MAX_TABLE_SIZE = 1 << 20
+
+
+class Strategy:
+    name = "base"
+
+    def __init__(self, seed=None, variant=engine.CLASSIC):
+        self.rng = random.Random(seed)
+        self.variant = variant
+        self.n_moves = len(variant)
+
+    def choose(self):
+        raise NotImplementedError
+
+    def observe(self, player_move, computer_move):
+        pass
+
+    def random_move(self):
+        return self.rng.randrange(self.n_moves)
+
+    def counter_most_likely(self, counts):
+        # Play what beats the player's most likely move, breaking ties at random
+        best = max(counts)
+        if best == 0:
+            return self.random_move()
+        candidates = [m for m in range(self.n_moves) if counts[m] == best]
+        return self.variant.counter[self.rng.choice(candidates)]
+
+
+class RandomStrategy(Strategy):
+    name = "random"
+
+    def choose(self):
+        return self.random_move()
+
+
+class FrequencyStrategy(Strategy):
+    # Counters the player's most frequent move overall
+    name = "frequency"
+
+    def __init__(self, seed=None, variant=engine.CLASSIC):
+        super().__init__(seed, variant)
+        self.counts = [0] * self.n_moves
+
+    def choose(self):
+        return self.counter_most_likely(self.counts)
+
+    def observe(self, player_move, computer_move):
+        self.counts[player_move] += 1
+
+
+class MarkovStrategy(Strategy):
+    # Predicts the player's next move from their last `order` moves. The
+    # context is kept as a rolling base-N index into a flat count table of
+    # N ** order rows, so lookups and updates are O(1).
+    name = "markov"
+
+    def __init__(self, order=2, seed=None, variant=engine.CLASSIC):
+        super().__init__(seed, variant)
+        n = self.n_moves
+        while order > 1 and n ** (order + 1) > MAX_TABLE_SIZE:
+            order -= 1
+        self.order = order
+        self.contexts = n ** order
+        self.counts = array("I", bytes(4 * self.contexts * n))
+        self.context = 0
+        self.seen = 0
+
+    def choose(self):
+        if self.seen < self.order:
+            return self.random_move()
+        row = self.context * self.n_moves
+        return self.counter_most_likely(self.counts[row:row + self.n_moves])
+
+    def observe(self, player_move, computer_move):
+        if self.seen >= self.order:
+            self.counts[self.context * self.n_moves + player_move] += 1
+        else:
+            self.seen += 1
+        self.context = (self.context * self.n_moves + player_move) % self.contexts
+
+
+class MixedStrategy(Strategy):
+    # Runs several strategies side by side and follows whichever one would
+    # have scored best recently. Scores decay so it adapts when the player
+    # changes style.
+    name = "mixed"
+
+    def __init__(self, strategies=None, decay=0.9, seed=None, variant=engine.CLASSIC):
+        super().__init__(seed, variant)
+        if strategies is None:
+            strategies = [RandomStrategy(self.rng.random(), variant), FrequencyStrategy(self.rng.random(), variant),
+                          MarkovStrategy(1, self.rng.random(), variant), MarkovStrategy(2, self.rng.random(), variant)]
+        self.strategies = strategies
+        self.decay = decay
+        self.scores = [0.0] * len(strategies)
+        self.choices = None
+
+    def choose(self):
+        self.choices = [strategy.choose() for strategy in self.strategies]
+        best = max(range(len(self.strategies)), key=self.scores.__getitem__)
+        return self.choices[best]
+
+    def observe(self, player_move, computer_move):
+        if self.choices is None:
+            self.choices = [strategy.choose() for strategy in self.strategies]
+        for i, strategy in enumerate(self.strategies):
+            outcome = self.variant.outcomes[player_move][self.choices[i]]
+            reward = 1 if outcome == engine.COMPUTER_WIN else -1 if outcome == engine.PLAYER_WIN else 0
+            self.scores[i] = self.scores[i] * self.decay + reward
+            strategy.observe(player_move, self.choices[i])
+        self.choices = None
+
+
+STRATEGIES = {
+    RandomStrategy.name: RandomStrategy,
+    FrequencyStrategy.name: FrequencyStrategy,
+    MarkovStrategy.name: MarkovStrategy,
+    MixedStrategy.name: MixedStrategy,
+}
+
+
+def create(name, seed=None, variant=engine.CLASSIC):
+    try:
+        return STRATEGIES[name](seed=seed, variant=variant)
+    except KeyError:
+        raise ValueError(f"Unknown strategy {name!r}, choose from: {', '.join(STRATEGIES)}") from None
+
+
+# Microbenchmark
+
+def biased_player(rng):
+    # A predictable opponent: mostly repeats a short cycle with some noise
+    cycle = (engine.ROCK, engine.ROCK, engine.PAPER, engine.SCISSORS)
+    i = 0
+    while True:
+        yield cycle[i % len(cycle)] if rng.random() < 0.8 else rng.randrange(N_MOVES)
+        i += 1
+
+
+def bench_latency(name, rounds, seed=0):
+    strategy = create(name, seed)
+    player = biased_player(random.Random(seed))
+    timings = array("q", bytes(8 * rounds))
+    computer_wins = 0
+    clock = time.perf_counter_ns
+    for i in range(rounds):
+        player_move = next(player)
+        start = clock()
+        computer_move = strategy.choose()
+        strategy.observe(player_move, computer_move)
+        timings[i] = clock() - start
+        computer_wins += engine.OUTCOME_TABLE[player_move][computer_move] == engine.COMPUTER_WIN
+
+    ordered = sorted(timings)
+    percentile = lambda p: ordered[min(rounds - 1, int(p * rounds))] / 1000
+    return {"p50_us": percentile(0.5), "p99_us": percentile(0.99), "max_us": ordered[-1] / 1000,
+            "computer_win_rate": computer_wins / rounds}
+
+
+def bench_memory(name, rounds, seed=0):
+    # Traced heap size of the strategy at each power of ten
+    player = biased_player(random.Random(seed))
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    strategy = create(name, seed)
+    checkpoints = {}
+    next_checkpoint = 1
+    for i in range(1, rounds + 1):
+        strategy.observe(next(player), strategy.choose())
+        if i == next_checkpoint or i == rounds:
+            checkpoints[i] = tracemalloc.get_traced_memory()[0] - baseline
+            next_checkpoint *= 10
+    tracemalloc.stop()
+    return checkpoints
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-move latency and memory growth of the computer strategies")
+    parser.add_argument("--rounds", type=int, default=1000000)
+    parser.add_argument("strategies", nargs="*", default=list(STRATEGIES))
+    args = parser.parse_args()
+
+    for name in args.strategies:
+        latency = bench_latency(name, args.rounds)
+        memory = bench_memory(name, args.rounds)
+        print(f"{name}: p50 {latency['p50_us']:.2f}us  p99 {latency['p99_us']:.2f}us  "
+              f"max {latency['max_us']:.1f}us  computer win rate {latency['computer_win_rate']:.1%}")
+        print("    memory: " + "  ".join(f"{n:,} rounds {size / 1024:.1f} KiB" for n, size in memory.items()))
+
+
+if __name__ == "__main__":
+    main()
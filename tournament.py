@@ -0,0 +1,220 @@
+import os
+import sys
+import random
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import engine
+import strategies
+
+# Round-robin and Swiss tournaments between computer strategies, played with
+# the same first-to-5 rules as the game. Games are split into chunks that run
+# on a process pool and stream back as they finish. Every game gets its own
+# seed derived from the tournament seed, so results do not depend on the
+# number of workers or the chunk size.
+
+MAX_ROUNDS = 500  # A game still undecided after this many rounds is a draw
+ELO_START = 1500
+ELO_K = 16
+
+
+def game_seed(seed, stage, a, b, game):
+    return f"{seed}:{stage}:{a}:{b}:{game}"
+
+
+def play_game(a, b, seed):
+    # One first-to-5 match, a plays the "player" side. Returns the outcome for a.
+    rng = random.Random(seed)
+    first = strategies.create(a, rng.random())
+    second = strategies.create(b, rng.random())
+    match = engine.Match()
+    for _ in range(MAX_ROUNDS):
+        move_a, move_b = first.choose(), second.choose()
+        match.play_round(move_a, move_b)
+        # Each strategy sees its opponent as the player
+        first.observe(move_b, move_a)
+        second.observe(move_a, move_b)
+        if match.finished:
+            return engine.PLAYER_WIN if match.winner == "player" else engine.COMPUTER_WIN
+    return engine.TIE
+
+
+def play_chunk(task_id, a, b, seed, stage, games):
+    # Runs in a worker process, games is a range of game numbers in the series
+    return task_id, a, b, bytes(play_game(a, b, game_seed(seed, stage, a, b, game)) for game in games)
+
+
+def share(won, lost, drawn):
+    # Share of games won, draws count half, None when nothing was played
+    total = won + lost + drawn
+    return (won + drawn / 2) / total if total else None
+
+
+class Standings:
+    def __init__(self, names):
+        self.names = list(names)
+        self.elo = {name: float(ELO_START) for name in names}
+        self.points = {name: 0.0 for name in names}
+        self.results = {}  # (a, b) -> [a wins, b wins, draws]
+        self.games = 0
+
+    def record(self, a, b, outcomes):
+        # Elo is updated game by game, so callers feed results in a fixed order
+        counts = self.results.setdefault((a, b), [0, 0, 0])
+        for outcome in outcomes:
+            score = 1.0 if outcome == engine.PLAYER_WIN else 0.0 if outcome == engine.COMPUTER_WIN else 0.5
+            counts[0 if score == 1.0 else 1 if score == 0.0 else 2] += 1
+            expected = 1 / (1 + 10 ** ((self.elo[b] - self.elo[a]) / 400))
+            self.elo[a] += ELO_K * (score - expected)
+            self.elo[b] -= ELO_K * (score - expected)
+        self.games += len(outcomes)
+
+    def series_score(self, a, b):
+        # Share of all games a won against b, or None if they never met
+        won, lost, drawn = self.results.get((a, b), (0, 0, 0))
+        back_won, back_lost, back_drawn = self.results.get((b, a), (0, 0, 0))
+        return share(won + back_lost, lost + back_won, drawn + back_drawn)
+
+    def win_rates(self):
+        totals = {name: [0, 0, 0] for name in self.names}
+        for (a, b), (won, lost, drawn) in self.results.items():
+            totals[a][0] += won
+            totals[a][1] += lost
+            totals[a][2] += drawn
+            totals[b][0] += lost
+            totals[b][1] += won
+            totals[b][2] += drawn
+        return {name: share(*counts) or 0.0 for name, counts in totals.items()}
+
+    def table(self):
+        rates = self.win_rates()
+        lines = [f"{'strategy':<12}{'elo':>8}{'points':>8}{'win rate':>10}"]
+        for name in sorted(self.names, key=lambda n: (-self.points[n], -self.elo[n], n)):
+            lines.append(f"{name:<12}{self.elo[name]:>8.0f}{self.points[name]:>8.1f}{rates[name]:>10.1%}")
+
+        width = max(len(name) for name in self.names) + 2
+        lines.append("")
+        lines.append(" " * width + "".join(f"{name:>{width}}" for name in self.names))
+        for a in self.names:
+            scores = [None if a == b else self.series_score(a, b) for b in self.names]
+            cells = ["-" if score is None else f"{score:.0%}" for score in scores]
+            lines.append(f"{a:<{width}}" + "".join(f"{cell:>{width}}" for cell in cells))
+        return "\n".join(lines)
+
+
+def run_stage(executor, standings, pairings, seed, stage, games, chunk_size, progress=None):
+    # Plays every pairing of one stage. Results arrive in completion order and
+    # are held until all earlier chunks are in, so Elo is applied in task order.
+    # Returns this stage's (a wins, b wins, draws) for each pairing.
+    tasks = []
+    for a, b in pairings:
+        for start in range(0, games, chunk_size):
+            tasks.append((len(tasks), a, b, seed, stage, range(start, min(start + chunk_size, games))))
+
+    futures = [executor.submit(play_chunk, *task) for task in tasks]
+    finished = {}
+    series = {pairing: [0, 0, 0] for pairing in pairings}
+    next_task = 0
+    for future in as_completed(futures):
+        task_id, a, b, outcomes = future.result()
+        finished[task_id] = (a, b, outcomes)
+        counts = series[a, b]
+        counts[0] += outcomes.count(engine.PLAYER_WIN)
+        counts[1] += outcomes.count(engine.COMPUTER_WIN)
+        counts[2] += outcomes.count(engine.TIE)
+        while next_task in finished:
+            standings.record(*finished.pop(next_task))
+            next_task += 1
+            if progress:
+                progress(standings, next_task, len(tasks))
+    return series
+
+
+def award_series(standings, a, b, counts):
+    # Points for one series, from that series' games only so a Swiss rematch
+    # is not decided by the earlier meeting
+    score = share(*counts)
+    standings.points[a] += 1.0 if score > 0.5 else 0.5 if score == 0.5 else 0.0
+    standings.points[b] += 1.0 if score < 0.5 else 0.5 if score == 0.5 else 0.0
+
+
+def round_robin(executor, names, games, seed, chunk_size, progress=None):
+    standings = Standings(names)
+    pairings = list(itertools.combinations(names, 2))
+    series = run_stage(executor, standings, pairings, seed, "rr", games, chunk_size, progress)
+    for a, b in pairings:
+        award_series(standings, a, b, series[a, b])
+    return standings
+
+
+def swiss_pairings(standings, played):
+    # Pair neighbours in the standings, skipping rematches where possible.
+    # With an odd field the lowest ranked player without a bye sits out.
+    order = sorted(standings.names, key=lambda n: (-standings.points[n], -standings.elo[n], n))
+    bye = None
+    if len(order) % 2:
+        bye = next((n for n in reversed(order) if (n, None) not in played), order[-1])
+        order.remove(bye)
+
+    pairings = []
+    while order:
+        a = order.pop(0)
+        b = next((n for n in order if frozenset((a, n)) not in played), order[0])
+        order.remove(b)
+        pairings.append((a, b))
+    return pairings, bye
+
+
+def swiss(executor, names, games, seed, chunk_size, rounds=None, progress=None):
+    standings = Standings(names)
+    rounds = rounds or max(1, (len(names) - 1).bit_length())
+    played = set()
+    for number in range(rounds):
+        pairings, bye = swiss_pairings(standings, played)
+        if bye:
+            standings.points[bye] += 1.0
+            played.add((bye, None))
+        series = run_stage(executor, standings, pairings, seed, f"swiss{number}", games, chunk_size, progress)
+        for a, b in pairings:
+            award_series(standings, a, b, series[a, b])
+            played.add(frozenset((a, b)))
+    return standings
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Tournaments between computer strategies")
+    parser.add_argument("strategies", nargs="*", default=list(strategies.STRATEGIES))
+    parser.add_argument("--format", choices=["round-robin", "swiss"], default="round-robin")
+    parser.add_argument("--games", type=int, default=200, help="first-to-5 games per pairing")
+    parser.add_argument("--rounds", type=int, default=None, help="Swiss rounds, defaults to log2 of the field")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=50, help="games per task sent to a worker")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for name in args.strategies:
+        if name not in strategies.STRATEGIES:
+            parser.error(f"unknown strategy {name!r}, choose from: {', '.join(strategies.STRATEGIES)}")
+    if len(set(args.strategies)) != len(args.strategies):
+        parser.error("each strategy can enter only once")
+    if args.games < 1:
+        parser.error("--games must be at least 1")
+    if len(args.strategies) < 2:
+        parser.error("a tournament needs at least two strategies")
+
+    def progress(standings, done, total):
+        print(f"\r{standings.games:,} games played ({done}/{total} tasks)", end="", file=sys.stderr, flush=True)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        if args.format == "swiss":
+            standings = swiss(executor, args.strategies, args.games, args.seed, args.chunk_size,
+                              args.rounds, progress)
+        else:
+            standings = round_robin(executor, args.strategies, args.games, args.seed, args.chunk_size, progress)
+    print(file=sys.stderr)
+    print(standings.table())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])